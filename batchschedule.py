@@ -0,0 +1,97 @@
+import heapq
+import math
+
+import numpy as np
+
+from simstats import inverseLogGamma
+
+
+# Closed-form schedule of the non-preemptive policies when every job is there at 0
+# FIFO and SJF start all the jobs at 0 and never take a job off its CPU, so the event
+# loop only ever gives the next job of the queue to the CPU that is free first, ties
+# going to the CPU that was dispatched first, the same as the event queue
+# the whole schedule is the jobs in queue order, FIFO or (cycles, PID), put one after
+# the other on a heap of the k CPUs keyed on (free time, dispatch order), O(n log k)
+# and the statistics are computed over the arrays with NumPy instead of per completion
+# the batch run only takes integer cycles and speed factors, where the sums do not
+# depend on the order of the completions, and no event trace, the simulations fall
+# back to the event loop otherwise
+
+
+def listSchedule(cycles, speed, cpus):
+    # the start and completion time of each job, in queue order
+    # cycles is a sequence of ints, speed the time multiple of each CPU and cpus the
+    # idle CPUs in the order the event loop would take them
+    n = len(cycles)
+    start = [0] * n
+    completion = [0] * n
+    # (free time, dispatch order, CPU)
+    free = [(0, order, cpu) for order, cpu in enumerate(cpus)]
+    order = len(free)
+    for i, jobCycles in enumerate(cycles):
+        time, _, cpu = free[0]
+        done = time + jobCycles * speed[cpu]
+        heapq.heapreplace(free, (done, order, cpu))
+        order += 1
+        start[i] = time
+        completion[i] = done
+    return start, completion
+
+
+def addValues(distribution, values):
+    # add an int64 array of values to a simstats Distribution, the same as adding them
+    # one by one
+    if len(values) == 0:
+        return
+    low, high = int(values.min()), int(values.max())
+    distribution.min = low if distribution.count == 0 else min(distribution.min, low)
+    distribution.max = high if distribution.count == 0 else max(distribution.max, high)
+    distribution.count += len(values)
+    # exact integer sums, the squares do not fit in 64 bits
+    ints = values.tolist()
+    distribution.total += sum(ints)
+    distribution.squares += sum(map(int.__mul__, ints, ints))
+    positive = values[values >= 1]
+    distribution.zeros += len(values) - len(positive)
+    scaled = np.log(positive.astype(np.float64)) * inverseLogGamma
+    keys = np.ceil(scaled)
+    # the log of NumPy and of math may differ in the last bit, the values close to a
+    # bucket boundary are put with math.log like Distribution.add
+    close = np.flatnonzero(np.abs(scaled - np.rint(scaled)) < 1e-9)
+    for i in close.tolist():
+        keys[i] = math.ceil(math.log(int(positive[i])) * inverseLogGamma)
+    buckets = distribution.buckets
+    for key, count in zip(*np.unique(keys.astype(np.int64), return_counts=True)):
+        key = int(key)
+        buckets[key] = buckets.get(key, 0) + int(count)
+
+
+def runBatch(simo, processes, shortestFirst=False):
+    # run the processes of a FIFO or SJF simulation in one go, returns False when the
+    # batch run does not apply and the event loop has to run them
+    if simo.trace.events or not all(type(speed) is int for speed in simo.speed):
+        return False
+    cycles = np.array([process.RemCPUCycles for process in processes])
+    if len(processes) == 0 or cycles.dtype != np.int64:
+        return False
+    if shortestFirst:
+        # the order of the ShortestJobQueue, (RemCPUCycles, PID)
+        order = np.lexsort((np.array([process.PID for process in processes]), cycles))
+        processes = [processes[i] for i in order.tolist()]
+        cycles = cycles[order]
+    start, completion = listSchedule(cycles.tolist(), simo.speed, list(simo.idleCPUs))
+    for process, startTime, completedTime in zip(processes, start, completion):
+        process.startTime = startTime
+        process.RemCPUCycles = 0
+        process.completedTime = completedTime
+    # the same times as CompletionStats.add
+    turnaround = np.array(completion, dtype=np.int64) - np.array([process.arrivalTime for process in processes], dtype=np.int64)
+    wait = turnaround - np.array([process.CPUCycles for process in processes], dtype=np.int64)
+    small = np.array([process.MemorySize for process in processes]) <= simo.completed.smallMemory
+    for memoryClass, jobs in (("8GB", small), ("16GB", ~small)):
+        classWait, classTurnaround = simo.completed.classes[memoryClass]
+        addValues(classWait, wait[jobs])
+        addValues(classTurnaround, turnaround[jobs])
+    simo.contextSwitches += len(processes)
+    simo.currentTime = max(completion)
+    return True
@@ -0,0 +1,163 @@
+import argparse
+import importlib
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from process_generator_arrivaltime import generate
+from sweep import newSimulation, policies
+from workload import readWorkload, streamArrivals
+
+
+# Benchmarks of the simulators themselves
+# every policy is run on generated workloads of growing size with tracing off,
+# the workloads come from a fixed seed so every run simulates the same jobs
+# each run is in a fresh process, so its peak RSS is its own, and reports
+#   jobsPerSecond   - jobs simulated per second of run()
+#   eventsPerSecond - dispatches and completions that went through the event loop per
+#                     second of run(), from the profile counters of one more run
+#   skippedQuanta   - RR quanta run out without an event, not in the events
+#   batchJobs       - jobs scheduled in one go without the event loop, not in the events
+#   peakRSS         - peak resident memory of the process, bytes
+#   bytesPerJob     - peak of the memory allocated by loading and running the workload,
+#                     per job, traced with tracemalloc in the profiled run
+# the shortcuts simulate the same schedule with fewer events, so the events are only
+# comparable between runs that take the same shortcuts, the variants run FIFO and SJF
+# with the batch schedule off, so their events go through the event loop
+# a run is a regression when its events per second drop more than the threshold below
+# the baseline, or its jobs per second for the runs with no events
+#
+# python benchmark.py --save benchmark_baseline.json
+# python benchmark.py --compare benchmark_baseline.json --threshold 0.2
+
+
+sizes = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+seed = 0
+
+# parameters of the benchmark runs, a quantum of about a fifth of the mean job
+# keeps round robin at a few dispatches per job at every size, a top level quantum
+# of a fiftieth keeps MLFQ at about 9 dispatches per job, boosts included
+benchmarkParams = {
+    "RR": {"TimeQuantum": 10 ** 11},
+    "MLFQ": {"TimeQuantum": 10 ** 10},
+}
+
+# name -> (policy, parameters over benchmarkParams), benchmarked as policies
+variants = {
+    "FIFO-eventloop": ("FIFO", {"batchMode": False}),
+    "SJF-eventloop": ("SJF", {"batchMode": False}),
+}
+
+
+def benchmarkPolicy(name):
+    # the policy and the parameters of a policy or variant name
+    policy, params = variants.get(name, (name, {}))
+    return policy, dict(benchmarkParams.get(policy, {}), **params)
+
+
+def workloadPath(directory, size):
+    # the workload of the size, generated on first use
+    path = os.path.join(directory, "benchmark{}.bin".format(size))
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        generate(path, size, seed, "binary")
+    return path
+
+
+def maxRSS():
+    # peak resident memory of this process in bytes, ru_maxrss is in KB on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def runBenchmark(name, path, size, repeat):
+    # run in a fresh process, the best of repeat runs
+    policy, params = benchmarkPolicy(name)
+    module = importlib.import_module(policies[policy][0])
+    # the counts and the memory of a profiled run, the timed runs are not profiled
+    tracemalloc.start()
+    simo = newSimulation(policy, params, profile=True)
+    module.addProcesses(simo, streamArrivals(path) if policies[policy][1] else readWorkload(path))
+    simo.run()
+    counts = simo.stats()
+    peakTraced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del simo
+    # the dispatches and completions the shortcuts did not take through the event loop
+    skippedQuanta = counts["skippedQuanta"]
+    batchJobs = counts["batchJobs"]
+    events = counts["dispatches"] + counts["completions"] - skippedQuanta - 2 * batchJobs
+    best = None
+    for i in range(repeat):
+        simo = newSimulation(policy, params)
+        module.addProcesses(simo, streamArrivals(path) if policies[policy][1] else readWorkload(path))
+        start = time.perf_counter()
+        simo.run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best["seconds"]:
+            best = {"seconds": elapsed, "jobsPerSecond": counts["processes"] / elapsed,
+                    "events": events, "eventsPerSecond": events / elapsed,
+                    "skippedQuanta": skippedQuanta, "batchJobs": batchJobs}
+        del simo
+    best["peakRSS"] = maxRSS()
+    best["bytesPerJob"] = peakTraced / size
+    return best
+
+
+def benchmark(policyNames, sizes, directory, repeat=3):
+    # results by "policy/size", the variants by their names
+    results = {}
+    for size in sizes:
+        path = workloadPath(directory, size)
+        for policy in policyNames:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(runBenchmark, policy, path, size, repeat).result()
+            results["{}/{}".format(policy, size)] = result
+            print("{:>14} {:>8} jobs: {:>10.0f} jobs/s, {:>10.0f} events/s, {:>9} skipped quanta, {:>8} batch jobs, {:>8.3f} s, peak RSS {:>7.1f} MB, {:>6.0f} bytes/job".format(
+                policy, size, result["jobsPerSecond"], result["eventsPerSecond"], result["skippedQuanta"], result["batchJobs"],
+                result["seconds"], result["peakRSS"] / 2 ** 20, result["bytesPerJob"]))
+    return results
+
+
+def regressions(results, baseline, threshold):
+    # the benchmarks whose events per second, or jobs per second if they have no
+    # events, are more than threshold below the baseline
+    slower = []
+    for name, result in results.items():
+        if name in baseline and "eventsPerSecond" in baseline[name]:
+            rate = "eventsPerSecond" if baseline[name]["events"] > 0 else "jobsPerSecond"
+            expected = baseline[name][rate]
+            if result[rate] < expected * (1 - threshold):
+                slower.append((name, rate, result[rate], expected))
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scheduling simulators")
+    parser.add_argument("-p", "--policy", nargs="+", choices=list(policies) + list(variants), default=list(policies) + list(variants))
+    parser.add_argument("-n", "--sizes", nargs="+", type=int, default=sizes, help="jobs per workload")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per benchmark, the best is kept")
+    parser.add_argument("-d", "--workloads", default="benchmark_workloads", help="directory of the generated workloads")
+    parser.add_argument("--save", default=None, help="save the results as a baseline JSON")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed drop in events/s, e.g. 0.1 for 10%%")
+    args = parser.parse_args()
+
+    results = benchmark(args.policy, args.sizes, args.workloads, args.repeat)
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        slower = regressions(results, baseline, args.threshold)
+        for name, rate, value, expected in slower:
+            print("Regression: {} runs {:.0f} {}, baseline {:.0f}".format(name, value, "events/s" if rate == "eventsPerSecond" else "jobs/s", expected))
+        if slower:
+            sys.exit(1)
+        print("No regression beyond {:.0%} of the baseline".format(args.threshold))
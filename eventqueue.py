@@ -0,0 +1,78 @@
+import heapq
+from itertools import count
+
+
+# Event queue shared by all the simulations
+# events are kept in a binary heap keyed on (timestamp, sequence number)
+# the sequence number is the insertion order, so events with the same timestamp
+# come out in the order they were put in, the same as the old min-scan over a list,
+# events put in with pushFirst come out before the others with the same timestamp,
+# so a stream of arrivals put in one at a time keeps the order it had when the whole
+# workload was put in at the start, an arrival before a completion at the same time
+# push returns a handle for the event, cancelling the handle only marks the entry
+# as removed in O(1), removed entries are skipped when popped and the heap is
+# compacted when they make up more than half of it
+
+
+class EventQueue:
+    # do not bother compacting small heaps
+    compactThreshold = 64
+
+    def __init__(self):
+        # heap of [timestamp, sequence, event] entries, event is None once cancelled
+        self.heap = []
+        # tie-breaker for events with the same timestamp
+        self.sequence = count()
+        # tie-breaker of the events put in with pushFirst, below all of the sequence
+        self.firstSequence = count(-2 ** 63)
+        # number of cancelled entries still in the heap
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self.heap) - self.cancelled
+
+    def __iter__(self):
+        # iterate over the pending events in the order they were put in
+        return (entry[2] for entry in sorted(self.heap, key=lambda entry: entry[1]) if entry[2] is not None)
+
+    def push(self, event):
+        # put an event to the queue, O(log n), returns the handle to cancel it
+        entry = [event.timestamp, next(self.sequence), event]
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def pushFirst(self, event):
+        # put an event to the queue ahead of the pushed events with the same time, O(log n)
+        entry = [event.timestamp, next(self.firstSequence), event]
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def pop(self):
+        # remove and return the event with the smallest time, O(log n)
+        while True:
+            event = heapq.heappop(self.heap)[2]
+            if event is not None:
+                return event
+            self.cancelled -= 1
+
+    def peek(self):
+        # return the event with the smallest time without removing it
+        while self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+            self.cancelled -= 1
+        return self.heap[0][2]
+
+    def cancel(self, handle):
+        # remove the event of the handle from the queue, O(1)
+        if handle[2] is None:
+            return
+        handle[2] = None
+        self.cancelled += 1
+        if self.cancelled > EventQueue.compactThreshold and self.cancelled * 2 > len(self.heap):
+            self.compact()
+
+    def compact(self):
+        # drop all the cancelled entries, O(n)
+        self.heap = [entry for entry in self.heap if entry[2] is not None]
+        heapq.heapify(self.heap)
+        self.cancelled = 0
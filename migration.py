@@ -0,0 +1,53 @@
+# Migration of running jobs between CPUs of different speeds
+# a CPU that is idle with no job waiting that it can run takes over a running job
+# whose completion moves the most, the time it would complete where it runs less
+# the time it completes on the idle CPU, a job is only moved when that gain is positive
+# a moved job runs migrationCost more cycles on its new CPU, e.g. to copy its memory
+# and warm up the caches, so a job close to completion or a CPU not much faster does
+# not pay off
+# the candidates are the latest completion of each group of the RunningJobIndex, on
+# CPUs of the same speed that is the job that gains the most, so the idle CPU looks
+# at one job per group and not at every running job
+
+
+class Migrator:
+    def __init__(self, speed, cost=0):
+        # time multiple of a job on each CPU
+        self.speed = speed
+        # cycles a moved job has to run again on its new CPU
+        self.cost = cost
+
+    def remaining(self, event, currentTime):
+        # cycles left for the job running until the event
+        process = event.process
+        return process.RemCPUCycles - (currentTime - process.startTime) // self.speed[event.cpu]
+
+    def gain(self, event, cpu, currentTime):
+        # how much sooner the job completes when moved to the CPU, negative when later
+        return event.timestamp - currentTime - (self.remaining(event, currentTime) + self.cost) * self.speed[cpu]
+
+    def best(self, running, groups, cpu, currentTime):
+        # the done event of the job of the groups that gains the most by moving to the
+        # idle CPU, None when no job gains
+        bestEvent = None
+        bestGain = 0
+        for group in groups:
+            event = running.longest(group)
+            if event is None:
+                continue
+            gain = self.gain(event, cpu, currentTime)
+            if gain > bestGain:
+                bestEvent = event
+                bestGain = gain
+        return bestEvent
+
+    def take(self, running, events, event, currentTime):
+        # stop the job running until the event, returns its process with the cycles
+        # it has left and the migration cost, ready to be dispatched on the new CPU
+        # remove the event from the queue, the handle is only marked as cancelled
+        events.cancel(running.remove(event))
+        process = event.process
+        process.RemCPUCycles = self.remaining(event, currentTime) + self.cost
+        # the remaining cycles are counted from the new start
+        process.startTime = currentTime
+        return process
@@ -0,0 +1,62 @@
+import argparse
+import time
+
+from predictors import predictors
+from sweep import sweep, writeResults
+
+
+# How much turnaround the shortest job first policies lose without knowing the job lengths
+# SJF and SRTF are run with the true lengths, the oracle, and with each predictor,
+# see predictors, and the turnaround of every predictor is reported against the oracle
+# on the same workload
+# the waiting jobs are ordered on the predictions of the time a CPU takes one, so SJF,
+# which queues all the jobs at the start, runs the first ones in PID order and then
+# the classes that have completed the shortest, see readyqueue
+#
+# python prediction.py processes8_16_arrival.csv -k exponential memoryBucket -a 0.2 0.5 0.8
+
+
+# the policies that take a predictor
+predictedPolicies = ("SJF", "SRTF")
+metrics = ("turnaroundTime", "turnaroundTimeP50", "turnaroundTimeP99", "waitTime")
+
+
+def compare(policyNames, predictorNames, alphas, workloads, workers=None):
+    # run the oracle and the predictors, returns the results of every run, the ones of
+    # the predictors with a <metric>Loss column, the relative increase over the oracle
+    oracle = sweep(policyNames, {"predictor": ["oracle"]}, workloads, workers)
+    predicted = sweep(policyNames, {"predictor": predictorNames, "predictionAlpha": alphas}, workloads, workers)
+    baseline = {(result["policy"], result["workload"]): result for result in oracle}
+    for result in predicted:
+        best = baseline[(result["policy"], result["workload"])]
+        for metric in metrics:
+            result[metric + "Loss"] = result[metric] / best[metric] - 1 if best[metric] else 0.0
+    return oracle, predicted
+
+
+def printComparison(oracle, predicted):
+    for best in oracle:
+        print("{} on {}, oracle turnaround {:.1f} s, p99 {:.1f} s".format(best["policy"], best["workload"], best["turnaroundTime"], best["turnaroundTimeP99"]))
+        for result in predicted:
+            if (result["policy"], result["workload"]) == (best["policy"], best["workload"]):
+                print("  {} alpha={}: turnaround {:.1f} s ({:+.1%}), p50 {:+.1%}, p99 {:+.1%}, wait {:+.1%}".format(
+                    result["predictor"], result["predictionAlpha"], result["turnaroundTime"], result["turnaroundTimeLoss"],
+                    result["turnaroundTimeP50Loss"], result["turnaroundTimeP99Loss"], result["waitTimeLoss"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the SJF policies with predicted job lengths to the true lengths")
+    parser.add_argument("workloads", nargs="+", help="workload files, CSV or binary")
+    parser.add_argument("-p", "--policy", nargs="+", choices=predictedPolicies, default=list(predictedPolicies))
+    parser.add_argument("-k", "--predictor", nargs="+", choices=[name for name in predictors if name != "oracle"], default=[name for name in predictors if name != "oracle"])
+    parser.add_argument("-a", "--alpha", nargs="+", type=float, default=[0.5], help="weights of the latest length in the exponential averages")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("-o", "--output", default=None, help="CSV of the result of every run")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    oracle, predicted = compare(args.policy, args.predictor, args.alpha, args.workloads, args.workers)
+    if args.output:
+        writeResults(oracle + predicted, args.output)
+    printComparison(oracle, predicted)
+    print("{} runs in {:.1f} seconds".format(len(oracle) + len(predicted), time.perf_counter() - start))
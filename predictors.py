@@ -0,0 +1,82 @@
+# Job length predictors for the shortest job first policies
+# SJF and SRTF order the jobs on their CPU cycles, which a real scheduler only knows
+# once a job has run, a predictor stands in for that knowledge:
+#   predict(process)   - the expected cycles of the process, from what has completed
+#   remaining(process) - the expected cycles it has left, the prediction less the cycles
+#                        it has run, 0 once it has run longer than predicted
+#   observe(process)   - the process has completed, its CPUCycles are known now
+# predictors, by name:
+#   oracle       - the true CPUCycles, what the policies always did
+#   exponential  - exponential average of the lengths of the completed jobs of the
+#                  same memory class, tau = alpha * length + (1 - alpha) * tau, the
+#                  classes are split at the memory of the small CPUs of the topology
+#   memoryBucket - the same per memory size in whole GB
+#   mean         - exponential average of all the completed jobs, no classes
+# before the first completion of a class the class gets the average of all the classes,
+# 0 before any completion, so the first jobs of a class are tried first
+
+
+def memoryClass(smallMemory):
+    # the memory class of a process, 8GB up to smallMemory, see Topology.smallMemory
+    return lambda process: "8GB" if process.MemorySize <= smallMemory else "16GB"
+
+
+def memoryBucket(process):
+    return int(process.MemorySize)
+
+
+def noClass(process):
+    return None
+
+
+class OraclePredictor:
+    def predict(self, process):
+        return process.CPUCycles
+
+    def remaining(self, process):
+        return process.RemCPUCycles
+
+    def observe(self, process):
+        pass
+
+
+class ExponentialAverage:
+    def __init__(self, alpha=0.5, key=memoryClass(8)):
+        self.alpha = alpha
+        # class of a process
+        self.key = key
+        # class -> exponential average of the lengths
+        self.estimates = {}
+        # exponential average over all the classes, None before the first completion
+        self.overall = None
+
+    def predict(self, process):
+        estimate = self.estimates.get(self.key(process))
+        if estimate is None:
+            return self.overall if self.overall is not None else 0
+        return estimate
+
+    def remaining(self, process):
+        return max(self.predict(process) - (process.CPUCycles - process.RemCPUCycles), 0)
+
+    def observe(self, process):
+        length = process.CPUCycles
+        key = self.key(process)
+        estimate = self.estimates.get(key)
+        self.estimates[key] = length if estimate is None else self.alpha * length + (1 - self.alpha) * estimate
+        self.overall = length if self.overall is None else self.alpha * length + (1 - self.alpha) * self.overall
+
+
+# name -> predictor of an averaging factor and the memory of the small memory class
+predictors = {
+    "oracle": lambda alpha, smallMemory: OraclePredictor(),
+    "exponential": lambda alpha, smallMemory: ExponentialAverage(alpha, memoryClass(smallMemory)),
+    "memoryBucket": lambda alpha, smallMemory: ExponentialAverage(alpha, memoryBucket),
+    "mean": lambda alpha, smallMemory: ExponentialAverage(alpha, noClass),
+}
+
+
+def makePredictor(name, alpha=0.5, smallMemory=8):
+    if name not in predictors:
+        raise KeyError("no predictor {}, one of {}".format(name, ", ".join(predictors)))
+    return predictors[name](alpha, smallMemory)
@@ -1,18 +1,27 @@
+import argparse
 import csv
-import random
-import matplotlib.pyplot as plt
 
-def customNormalDistribution(upper_bound, lower_bound, mean, std_deviation):
-    value = int(random.gauss(mean, std_deviation))
-    result = value % (upper_bound - lower_bound + 1) + lower_bound
-    return result
+import numpy as np
 
+from workload import BinaryWorkloadWriter
+
+# Workload generator
+# every column is drawn from a normal distribution and folded into its bounds with
+# a modulo, the same as before, but whole chunks of processes are drawn at once with
+# NumPy and written out before the next chunk, so memory stays at one chunk
+# the output is the CSV read by the simulations, or the binary workload format
+# histograms are only drawn when asked for and saved to files, no window is opened
+
+
+def customNormalDistribution(rng, size, upper_bound, lower_bound, mean, std_deviation):
+    # int() of a draw truncates towards zero, the modulo folds it into the bounds
+    values = np.trunc(rng.normal(mean, std_deviation, size)).astype(np.int64)
+    return values % (upper_bound - lower_bound + 1) + lower_bound
 
-def average(list):
-    return sum(list) / len(list)
 
 # Parameter Declarations
 number_of_processes = 250
+chunk_size = 1000000
 
 # CPU Cycle Distribution Parameters
 cpu_upper_bound = 10 ** 12
@@ -32,69 +41,112 @@ memory_lower_bound = 1
 memory_mean = 15
 memory_std_deviation = 3
 
-process_list = []
-
-for i in range(number_of_processes):
-    cpu_cycles = customNormalDistribution(cpu_upper_bound, cpu_lower_bound, cpu_mean, cpu_std_deviation)
-    memory = customNormalDistribution(memory_upper_bound, memory_lower_bound, memory_mean, memory_std_deviation)
-
-    arrival = customNormalDistribution(arrival_upper_bound, arrival_lower_bound, arrival_mean, arrival_std_deviation)
-    process = [i + 1, cpu_cycles, memory, arrival]
-    process_list.append(process)
-
-# Open or Create File to Write Data
-with open('processes8_16_arrival.csv', 'w', newline='') as csvfile:
-    # Initialize Writer Class
-    writer = csv.writer(csvfile)
-
-    # Write Column Headers
-    writer.writerow(['Process ID', 'CPU Cycles', 'Memory Requirement', 'Arrival Time'])
-    # Write Process Data
-    writer.writerows(process_list)
-
-# Select Values from CPU Cycles Column Only
-cpu_cycles = [row[1] for row in process_list]
-
-# Create Historgram of CPU Cycles
-plt.hist(cpu_cycles, 10)
-# Add Title and Axis Labels
-plt.title("CPU Cycle Distribution")
-plt.xlabel('CPU Cycles')
-plt.ylabel('Frequency')
-# Display Histogram
-plt.show()
-
-# Select Values from Memory Requirement Column Only
-memory = [row[2] for row in process_list]
-
-# Create Histogram of Memory Requirements
-plt.hist(memory, 10)
-# Add Title and Axis Labels
-plt.title("Memory Distribution")
-plt.xlabel('Memory Requirement')
-plt.ylabel('Frequency')
-# Display Histogram
-plt.show()
-
-arrival = [row[3] for row in process_list]
-
-# Create Histogram of Memory Requirements
-plt.hist(arrival, 10)
-# Add Title and Axis Labels
-plt.title("Arrival Distribution")
-plt.xlabel('Arrival Requirement')
-plt.ylabel('Frequency')
-# Display Histogram
-plt.show()
-
-# Print Calculated Average, Min Value & Max Value
-print("CPU Cycles")
-print("Average: ", average(cpu_cycles))
-print("Min Value: ", min(cpu_cycles))
-print("Max Value: ", max(cpu_cycles))
-
-# Print Calculated Average, Min Value & Max Value
-print("\nMemory Requirement")
-print("Average: ", average(memory))
-print("Min Value: ", min(memory))
-print("Max Value: ", max(memory))
+# Histograms: column, title, x label, bounds
+histograms = [
+    ("cpu_cycles", "CPU Cycle Distribution", "CPU Cycles", cpu_lower_bound, cpu_upper_bound),
+    ("memory", "Memory Distribution", "Memory Requirement", memory_lower_bound, memory_upper_bound),
+    ("arrival", "Arrival Distribution", "Arrival Requirement", arrival_lower_bound, arrival_upper_bound),
+]
+
+
+class ColumnSummary:
+    # running average, min and max and a 10 bin histogram of a column, chunk by chunk
+    def __init__(self, lower_bound, upper_bound):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.edges = np.linspace(lower_bound, upper_bound, 11)
+        self.counts = np.zeros(10, dtype=np.int64)
+
+    def add(self, values):
+        self.count += len(values)
+        self.total += int(values.sum())
+        low, high = int(values.min()), int(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.counts += np.histogram(values, self.edges)[0]
+
+    def average(self):
+        return self.total / self.count
+
+
+def generate(path, number_of_processes=number_of_processes, seed=None, format="csv", chunk_size=chunk_size):
+    # generate the workload into path, returns the summaries of the columns
+    # every column has its own random stream, so the workload of a seed does not
+    # depend on the chunk size
+    cpu_rng, memory_rng, arrival_rng = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(3)]
+    summaries = {name: ColumnSummary(low, high) for name, title, label, low, high in histograms}
+    if format == "binary":
+        writer = BinaryWorkloadWriter(path, number_of_processes)
+    else:
+        # Open or Create File to Write Data
+        csvfile = open(path, 'w', newline='')
+        # Write Column Headers
+        csv.writer(csvfile).writerow(['Process ID', 'CPU Cycles', 'Memory Requirement', 'Arrival Time'])
+
+    for start in range(0, number_of_processes, chunk_size):
+        size = min(chunk_size, number_of_processes - start)
+        pid = np.arange(start + 1, start + size + 1, dtype=np.int64)
+        cpu_cycles = customNormalDistribution(cpu_rng, size, cpu_upper_bound, cpu_lower_bound, cpu_mean, cpu_std_deviation)
+        memory = customNormalDistribution(memory_rng, size, memory_upper_bound, memory_lower_bound, memory_mean, memory_std_deviation)
+        arrival = customNormalDistribution(arrival_rng, size, arrival_upper_bound, arrival_lower_bound, arrival_mean, arrival_std_deviation)
+        # Write Process Data
+        if format == "binary":
+            writer.write(pid, cpu_cycles, memory, arrival)
+        else:
+            np.savetxt(csvfile, np.column_stack((pid, cpu_cycles, memory, arrival)), fmt='%d', delimiter=',')
+        summaries["cpu_cycles"].add(cpu_cycles)
+        summaries["memory"].add(memory)
+        summaries["arrival"].add(arrival)
+
+    if format == "binary":
+        writer.close()
+    else:
+        csvfile.close()
+    return summaries
+
+
+def plotHistograms(summaries, prefix):
+    # save the histograms as PNG files, without a display
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    for name, title, label, low, high in histograms:
+        summary = summaries[name]
+        plt.figure()
+        plt.stairs(summary.counts, summary.edges, fill=True)
+        # Add Title and Axis Labels
+        plt.title(title)
+        plt.xlabel(label)
+        plt.ylabel('Frequency')
+        plt.savefig("{}_{}.png".format(prefix, name))
+        plt.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a workload for the scheduling simulations")
+    parser.add_argument("-n", "--processes", type=int, default=number_of_processes)
+    parser.add_argument("-s", "--seed", type=int, default=None)
+    parser.add_argument("-o", "--output", default=None, help="default processes8_16_arrival.csv or .bin")
+    parser.add_argument("-f", "--format", choices=["csv", "binary"], default="csv")
+    parser.add_argument("--chunk-size", type=int, default=chunk_size)
+    parser.add_argument("--plot", action="store_true", help="save the histograms as PNG files")
+    args = parser.parse_args()
+    output = args.output or ("processes8_16_arrival.bin" if args.format == "binary" else "processes8_16_arrival.csv")
+
+    summaries = generate(output, args.processes, args.seed, args.format, args.chunk_size)
+    if args.plot:
+        plotHistograms(summaries, output.rsplit(".", 1)[0])
+
+    # Print Calculated Average, Min Value & Max Value
+    print("CPU Cycles")
+    print("Average: ", summaries["cpu_cycles"].average())
+    print("Min Value: ", summaries["cpu_cycles"].min)
+    print("Max Value: ", summaries["cpu_cycles"].max)
+
+    # Print Calculated Average, Min Value & Max Value
+    print("\nMemory Requirement")
+    print("Average: ", summaries["memory"].average())
+    print("Min Value: ", summaries["memory"].min)
+    print("Max Value: ", summaries["memory"].max)
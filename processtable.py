@@ -0,0 +1,141 @@
+import csv
+from array import array
+
+from workload import BinaryWorkload
+
+
+# Struct-of-arrays process table
+# every process attribute is a column of 64-bit integers, a process is an integer id
+# into the columns, so a multi-million job workload is a handful of flat arrays
+# instead of millions of Process objects with their own int objects
+# start and completion times are -1 until they are set
+# a ProcessRow is a small view of one id that looks like a Process to the simulations,
+# rows are created only when a process is handed to a simulation and the values
+# always live in the table
+# the PID, CPUCycles, MemorySize and arrival columns are never written by a run,
+# they can be any int64 buffers, e.g. memoryviews of a shared workload, only the
+# RemCPUCycles, start and completion columns belong to the table
+# an arrival column of None means every process arrives at 0
+
+
+NOT_SET = -1
+
+
+class ProcessTable:
+    def __init__(self):
+        self.PID = array("q")
+        self.CPUCycles = array("q")
+        self.RemCPUCycles = array("q")
+        self.MemorySize = array("q")
+        self.arrival = array("q")
+        self.start = array("q")
+        self.completion = array("q")
+
+    def __len__(self):
+        return len(self.PID)
+
+    def add(self, PID, CPUCycles, MemorySize, Arrival=0):
+        # add a process, returns its id
+        self.PID.append(PID)
+        self.CPUCycles.append(CPUCycles)
+        self.RemCPUCycles.append(CPUCycles)
+        self.MemorySize.append(MemorySize)
+        self.arrival.append(Arrival)
+        self.start.append(NOT_SET)
+        self.completion.append(NOT_SET)
+        return len(self.PID) - 1
+
+    def row(self, id):
+        # a Process-like view of the process with the id
+        return ProcessRow(self, id)
+
+    def rows(self):
+        return (ProcessRow(self, id) for id in range(len(self.PID)))
+
+    def reset(self):
+        # clear the per-run state, so the same table can be simulated again
+        self.RemCPUCycles = array("q", self.CPUCycles)
+        self.start = array("q", [NOT_SET]) * len(self.PID)
+        self.completion = array("q", [NOT_SET]) * len(self.PID)
+
+    @classmethod
+    def fromColumns(cls, PID, CPUCycles, MemorySize, arrival=None):
+        # a table over existing read-only columns, with its own per-run columns
+        table = cls()
+        table.PID = PID
+        table.CPUCycles = CPUCycles
+        table.MemorySize = MemorySize
+        table.arrival = arrival
+        table.reset()
+        return table
+
+    @classmethod
+    def fromCSV(cls, path, useArrival=True):
+        # load a workload in the generator's CSV layout
+        table = cls()
+        with open(path) as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',')
+            csvit = iter(csv_reader)
+            csvHeader = next(csvit)
+            for PID, CPUCycles, MemorySize, Arrival in csvit:
+                table.add(int(PID), int(CPUCycles), int(MemorySize), int(Arrival) if useArrival else 0)
+        return table
+
+    @classmethod
+    def fromBinary(cls, path, useArrival=True):
+        # load a binary workload, the columns are copied straight from the mapped file
+        workload = BinaryWorkload(path)
+        table = cls()
+        table.PID = array("q", workload.PID)
+        table.CPUCycles = array("q", workload.CPUCycles)
+        table.MemorySize = array("q", workload.MemorySize)
+        table.arrival = array("q", workload.Arrival) if useArrival else array("q", [0]) * len(workload)
+        table.reset()
+        workload.close()
+        return table
+
+
+def column(name):
+    # property reading and writing one column of the table at the row id
+    def get(self):
+        return getattr(self.table, name)[self.id]
+
+    def set(self, value):
+        getattr(self.table, name)[self.id] = value
+    return property(get, set)
+
+
+def optionalColumn(name):
+    # like column, but NOT_SET reads as None and None writes as NOT_SET
+    def get(self):
+        value = getattr(self.table, name)[self.id]
+        return None if value == NOT_SET else value
+
+    def set(self, value):
+        getattr(self.table, name)[self.id] = NOT_SET if value is None else value
+    return property(get, set)
+
+
+class ProcessRow:
+    __slots__ = ("table", "id")
+
+    def __init__(self, table, id):
+        self.table = table
+        self.id = id
+
+    PID = column("PID")
+    CPUCycles = column("CPUCycles")
+    RemCPUCycles = column("RemCPUCycles")
+    MemorySize = column("MemorySize")
+
+    @property
+    def arrivalTime(self):
+        arrival = self.table.arrival
+        return 0 if arrival is None else arrival[self.id]
+
+    startTime = optionalColumn("start")
+    completedTime = optionalColumn("completion")
+
+    def __str__(self):
+        # returns a string for the process to be printed
+        return "PID={}, Arrival={} CPUCycles={}/{}, Size={}, Started={}, Completed={}".format(self.PID, self.arrivalTime, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
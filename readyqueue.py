@@ -0,0 +1,82 @@
+import heapq
+
+
+# Ready queue for the shortest job first family of simulations
+# processes are kept in a binary heap keyed on (RemCPUCycles, PID)
+# so the shortest remaining job comes out first, ties go to the smaller PID
+# the key is taken when the process is put in, a process that was preempted
+# must be put back after its RemCPUCycles is updated
+# with a predictor, see predictors, the expected cycles of a waiting job change as
+# other jobs complete, so a key taken when the job is put in goes stale, the
+# PredictedJobQueue keeps one queue per predictor class instead, within a class all
+# the jobs have the same prediction and the job that has run the most has the least
+# left whatever the prediction is, so only the heads of the classes are compared with
+# the predictions of the time they are taken out
+
+
+class ShortestJobQueue:
+    def __init__(self, processes=()):
+        self.heap = [(process.RemCPUCycles, process.PID, process) for process in processes]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        # iterate over the waiting processes, in no particular order
+        return (entry[2] for entry in self.heap)
+
+    def append(self, process):
+        # put a process to the queue, O(log n)
+        heapq.heappush(self.heap, (process.RemCPUCycles, process.PID, process))
+
+    def pop(self):
+        # remove and return the process with the least remaining cycles, O(log n)
+        return heapq.heappop(self.heap)[2]
+
+    def peek(self):
+        # return the process with the least remaining cycles without removing it
+        return self.heap[0][2]
+
+
+class PredictedJobQueue:
+    def __init__(self, processes=(), predictor=None):
+        self.predictor = predictor
+        # predictor class -> heap of (-cycles run, PID, process)
+        self.classes = {}
+        self.count = 0
+        for process in processes:
+            self.append(process)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # iterate over the waiting processes, in no particular order
+        return (entry[2] for heap in self.classes.values() for entry in heap)
+
+    def append(self, process):
+        # put a process to the queue of its class, O(log n)
+        heap = self.classes.setdefault(self.predictor.key(process), [])
+        heapq.heappush(heap, (process.RemCPUCycles - process.CPUCycles, process.PID, process))
+        self.count += 1
+
+    def head(self):
+        # the class whose head has the least predicted remaining cycles now, ties go
+        # to the smaller PID, O(classes)
+        best = None
+        for heap in self.classes.values():
+            if heap:
+                process = heap[0][2]
+                key = (self.predictor.remaining(process), process.PID)
+                if best is None or key < best[0]:
+                    best = (key, heap)
+        return best[1]
+
+    def pop(self):
+        # remove and return the process with the least predicted remaining cycles
+        self.count -= 1
+        return heapq.heappop(self.head())[2]
+
+    def peek(self):
+        return self.head()[0][2]
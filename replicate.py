@@ -0,0 +1,137 @@
+import argparse
+import math
+import os
+import statistics
+import tempfile
+import time
+
+from process_generator_arrivaltime import generate, number_of_processes
+from sweep import parseParam, policies, sweep, writeResults
+
+
+# Monte Carlo replications of the scheduling simulations
+# one random workload says little about how two policies compare, so the policies
+# are run on K workloads generated from different seeds and every statistic is
+# reported as the mean over the workloads with its standard deviation and 95%
+# confidence interval
+# the replications are generated and run in batches over all the cores, with a
+# target the replications stop as soon as every confidence interval is narrower
+# than the target, relative to its mean, instead of running all K
+#
+# python replicate.py -p FIFO SJF -P CPUs.count=6 -k 100 --target 0.02
+
+
+metrics = ("waitTime", "turnaroundTime", "waitTimeP99", "turnaroundTimeP99", "contextSwitches")
+
+# two-sided 95% quantiles of Student's t distribution by degrees of freedom
+tQuantiles = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+    9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131,
+    16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074,
+    23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045,
+    30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+
+
+def tQuantile(df):
+    # the quantile of the largest tabled degrees of freedom not above df, so the
+    # interval is never narrower than the exact one, 1.96 past the table
+    if df > 120:
+        return 1.960
+    return tQuantiles[max(d for d in tQuantiles if d <= df)]
+
+
+def confidenceInterval(values):
+    # mean, standard deviation and half width of the 95% confidence interval
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, 0.0, math.inf
+    stddev = statistics.stdev(values)
+    return mean, stddev, tQuantile(len(values) - 1) * stddev / math.sqrt(len(values))
+
+
+def configuration(result, paramNames):
+    # the policy and parameters of a result, the same for all its replications
+    return (("policy", result["policy"]),) + tuple((name, result[name]) for name in paramNames if name in result)
+
+
+def summarize(results, paramNames):
+    # configuration -> {metric: (mean, stddev, half width, replications)}
+    groups = {}
+    for result in results:
+        groups.setdefault(configuration(result, paramNames), []).append(result)
+    summary = {}
+    for key, group in groups.items():
+        summary[key] = {}
+        for metric in metrics:
+            mean, stddev, halfWidth = confidenceInterval([result[metric] for result in group])
+            summary[key][metric] = (mean, stddev, halfWidth, len(group))
+    return summary
+
+
+def settled(summary, target, stopMetrics):
+    # whether every interval of the stop metrics is narrower than target times its mean
+    for stats in summary.values():
+        for metric in stopMetrics:
+            mean, stddev, halfWidth, n = stats[metric]
+            if 2 * halfWidth > target * abs(mean):
+                return False
+    return True
+
+
+def replicate(policyNames, params, replications, processes=number_of_processes, seed=0, target=None, minReplications=5, stopMetrics=("waitTime", "turnaroundTime"), workers=None, batchSize=None):
+    # run the policies on up to replications workloads, returns the results of every
+    # run and the summary, replication i uses the workload of the seeds (seed, i)
+    workers = workers or os.cpu_count()
+    batchSize = batchSize or workers
+    results = []
+    summary = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for first in range(0, replications, batchSize):
+            paths = []
+            for i in range(first, min(first + batchSize, replications)):
+                path = os.path.join(directory, "replication{}.bin".format(i))
+                generate(path, processes, (seed, i), "binary")
+                paths.append(path)
+            batch = sweep(policyNames, params, paths, workers)
+            for result in batch:
+                result["workload"] = os.path.basename(result["workload"])
+            results += batch
+            for path in paths:
+                os.remove(path)
+            summary = summarize(results, list(params))
+            if target is not None and first + len(paths) >= minReplications and settled(summary, target, stopMetrics):
+                break
+    return results, summary
+
+
+def printSummary(summary):
+    for key, stats in summary.items():
+        print(", ".join("{}={}".format(name, value) for name, value in key))
+        for metric in metrics:
+            mean, stddev, halfWidth, n = stats[metric]
+            print("  {}: {:.3f} +/- {:.3f} (stddev {:.3f}, 95% CI {:.3f} to {:.3f}, {} replications)".format(metric, mean, halfWidth, stddev, mean - halfWidth, mean + halfWidth, n))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scheduling simulations on many seeded workloads and report confidence intervals")
+    parser.add_argument("-p", "--policy", nargs="+", choices=list(policies), default=list(policies))
+    parser.add_argument("-P", "--param", action="append", default=[], help="NAME=v1,v2,... e.g. TimeQuantum=1e9,1e10")
+    parser.add_argument("-k", "--replications", type=int, default=30, help="most workloads to run")
+    parser.add_argument("-n", "--processes", type=int, default=number_of_processes, help="processes per workload")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--target", type=float, default=None, help="stop once every 95%% CI is narrower than this fraction of its mean, e.g. 0.02")
+    parser.add_argument("--min-replications", type=int, default=5)
+    parser.add_argument("-m", "--metric", nargs="+", choices=metrics, default=["waitTime", "turnaroundTime"], help="the metrics the target applies to")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("-b", "--batch", type=int, default=None, help="workloads per batch, default the number of workers")
+    parser.add_argument("-o", "--output", default=None, help="CSV of the result of every run")
+    args = parser.parse_args()
+
+    params = dict(parseParam(param) for param in args.param)
+    start = time.perf_counter()
+    results, summary = replicate(args.policy, params, args.replications, args.processes, args.seed, args.target, args.min_replications, args.metric, args.workers, args.batch)
+    if args.output:
+        writeResults(results, args.output)
+    printSummary(summary)
+    print("{} runs in {:.1f} seconds".format(len(results), time.perf_counter() - start))
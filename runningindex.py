@@ -0,0 +1,78 @@
+import heapq
+from itertools import count
+
+
+# Index of the jobs that are currently running, used for preemption decisions
+# running jobs are put into groups, e.g. by CPU class and memory class,
+# each group is a heap ordered by the projected completion time, latest first
+# on CPUs of the same speed the latest completion is the job with the most
+# remaining cycles, so the longest remaining job of a group is found in O(log n)
+# jobs that leave the CPU are only dropped from the running map, their heap
+# entries are skipped when they come to the top and cleaned up when too many
+# the index also keeps the event queue handle of each done event, so a preempted
+# or migrated job can have its done event cancelled in O(1)
+
+
+class RunningJobIndex:
+    def __init__(self):
+        # CPU -> (done event, group, event queue handle) of the job running on it
+        # in the order the jobs were dispatched
+        self.running = {}
+        # group -> heap of (-timestamp, sequence, event)
+        self.heaps = {}
+        # group -> number of jobs of the group still running
+        self.counts = {}
+        # tie-breaker, among equal completion times the earlier dispatch comes first
+        self.sequence = count()
+
+    def __len__(self):
+        return len(self.running)
+
+    def __contains__(self, event):
+        return self.isRunning(event)
+
+    def __iter__(self):
+        # iterate over the done events of the running jobs, in the order they were dispatched
+        return (entry[0] for entry in self.running.values())
+
+    def add(self, event, group, handle=None, key=None):
+        # a job is dispatched, its done event is put into the group
+        # ordered on key instead of the event time if given, e.g. a predicted completion
+        self.running[event.cpu] = (event, group, handle)
+        heapq.heappush(self.heaps.setdefault(group, []), (-(event.timestamp if key is None else key), next(self.sequence), event))
+        self.counts[group] = self.counts.get(group, 0) + 1
+
+    def remove(self, event):
+        # a job has completed, been preempted or migrated, returns the event queue handle
+        entry = self.running.get(event.cpu)
+        if entry is None or entry[0] is not event:
+            return None
+        del self.running[event.cpu]
+        group = entry[1]
+        self.counts[group] -= 1
+        heap = self.heaps[group]
+        # drop the stale entries once they are the majority of the heap
+        if len(heap) > 2 * self.counts[group] + 16:
+            self.heaps[group] = [e for e in heap if self.isRunning(e[2])]
+            heapq.heapify(self.heaps[group])
+        return entry[2]
+
+    def event(self, cpu):
+        # the done event of the job running on the CPU, or None
+        entry = self.running.get(cpu)
+        return entry[0] if entry is not None else None
+
+    def isRunning(self, event):
+        entry = self.running.get(event.cpu)
+        return entry is not None and entry[0] is event
+
+    def longest(self, group):
+        # return the done event of the job in the group that completes last, or None
+        heap = self.heaps.get(group)
+        if not heap:
+            return None
+        while heap and not self.isRunning(heap[0][2]):
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return heap[0][2]
@@ -0,0 +1,325 @@
+import argparse
+import heapq
+from collections import deque
+from itertools import count
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CLOCK, CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from workload import readWorkload
+from readyqueue import ShortestJobQueue
+from runningindex import RunningJobIndex
+from migration import Migrator
+
+
+# Minimum completion time dispatch on CPUs of any number of speed classes
+# every job is there at the start, the jobs are committed to the CPUs longest first,
+# each one to the CPU where it would complete first, the projected time the CPU is
+# free plus the job's cycles times the CPU's speed factor, so a long job waits for a
+# fast CPU when that is sooner than running on a slow one and the shorter ones fill
+# up the slow CPUs, with no fixed rule on the speed factors
+# committed longest first the CPUs end close together, shortest first leaves the
+# longest jobs for the end and the fast CPUs with them, then each CPU runs its own
+# jobs shortest first for the turnaround
+# the commit order is for the makespan, against the SJFheterogeneous 2x rule on 2 to
+# 4 classes of speed factors 1 to 20, all the jobs at the start, the makespan is
+# 0.3-5% shorter for 300 jobs and 0.01-0.6% for 3000, the turnaround is the same or
+# up to 0.8% longer, with 3000 jobs it is set by the shortest first order and not the
+# CPUs, committing each job to the CPU and place that costs the least turnaround,
+# speed factor times the jobs after it, gives up to 0.3% shorter turnaround for 300
+# jobs but up to 8.5% longer makespan, so it is not done
+# every CPU class keeps a heap of its CPUs on their projected free time, the CPUs of
+# a class have the same speed, so the best CPU of a class is the top of its heap and
+# a job looks at one CPU per class, O(classes + log k)
+# the CPUs run the jobs committed to them in order, a CPU with no jobs left takes the
+# job that gains the most by moving to it: the last job committed to the CPU of each
+# class that is free the latest, or the running job of a slower class that completes
+# the latest, the running jobs are in a RunningJobIndex grouped by CPU class and the
+# CPUs of each class with jobs committed in a heap on their projected free time, so an
+# idle CPU looks at two jobs per class, a running job is moved with the Migrator and
+# runs migrationCost cycles more, see migration
+# the statistics include the makespan, when the last job completes
+
+
+class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "startTime", "completedTime")
+
+    def __init__(self, PID, CPUCycles, MemorySize):
+        self.PID = PID
+        self.CPUCycles = CPUCycles
+        self.MemorySize = MemorySize
+        self.RemCPUCycles = CPUCycles
+
+        # statistics for each process
+        self.arrivalTime = 0
+        self.startTime = None
+        self.completedTime = None
+
+    def __str__(self):
+        # returns a string for the process to be printed
+        return "PID={}, CPUCycles={}/{}, Size={}, Started={}, Completed={}".format(self.PID, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
+
+class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
+    def __init__(self, process, timestamp, cpu):
+        self.process = process
+        self.timestamp = timestamp
+        self.cpu = cpu
+
+def defaultTopology():
+    # 6 CPUs, the same as the heterogeneous policy, a slow CPU is 2x slower
+    return Topology([
+        CPUClass("slow", 3, speedFactor=2, names=["Pa", "Pb", "Pc"]),
+        CPUClass("fast", 3, speedFactor=1, names=["Pd", "Pe", "Pf"]),
+    ])
+
+class Simulation:
+    # cycles a running job migrated to another CPU has to run again
+    migrationCost = 0
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
+        # incoming process queue, committed to the CPUs shortest job first
+        self.incomingProcesses = ShortestJobQueue()
+
+        self.contextSwitches = 0
+
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
+
+        # a queue of events, ordered by time
+        self.events = EventQueue()
+        # done events of the running jobs, grouped by CPU class
+        self.running = RunningJobIndex()
+        # picks the running job an idle CPU takes over, made in run from migrationCost
+        self.migrator = None
+        # simulation time
+        self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology
+        self.topology = topology
+        self.CPUs = list(range(len(topology)))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
+        # the running index group of each CPU, its class name
+        self.group = [cpuClass.name for cpuClass in topology.cpuClass]
+        # the jobs committed to each CPU and not started yet
+        self.queued = [deque() for cpu in self.CPUs]
+        # per CPU class, fastest first, (speed factor, heap of (projected free time, order, CPU))
+        # among CPUs free at the same time the first in the topology comes first
+        self.order = count(len(topology))
+        self.availability = [(cpuClass.speedFactor, [(0, cpu, cpu) for cpu in cpuClass.cpus])
+                             for cpuClass in sorted(topology.classes, key=lambda cpuClass: cpuClass.speedFactor) if cpuClass.count > 0]
+        # projected time each CPU is done with its running and committed jobs
+        self.projected = [0 for cpu in self.CPUs]
+        # per CPU class, heap of (-projected free time, CPU) of the CPUs with jobs committed,
+        # entries that no longer match self.projected are dropped when they come on top
+        self.backlog = {cpuClass.name: [] for cpuClass in topology.classes}
+
+    def isDone(self):
+        return len(self.events) == 0 and len(self.incomingProcesses) == 0 and not any(self.queued)
+
+    def commit(self, process):
+        # put the process on the CPU where it completes first, the earliest free CPU
+        # of each class is the top of its heap, ties go to the faster class
+        bestTime = None
+        for speed, heap in self.availability:
+            completion = heap[0][0] + process.RemCPUCycles * speed
+            if bestTime is None or completion < bestTime:
+                bestTime = completion
+                bestHeap = heap
+        cpu = bestHeap[0][2]
+        heapq.heapreplace(bestHeap, (bestTime, next(self.order), cpu))
+        self.queued[cpu].append(process)
+        self.projected[cpu] = bestTime
+
+    def start(self, process, cpu, profiling):
+        if profiling:
+            self.profile.count("dispatches")
+        process.startTime = self.currentTime
+        if self.trace.events:
+            self.trace.start(self.currentTime, process, self.topology.names[cpu])
+        completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
+        # put an event to the queue
+        handle = self.events.push(completedEvent)
+        self.running.add(completedEvent, self.group[cpu], handle)
+        self.contextSwitches += 1
+
+    def pushBacklog(self, cpu):
+        if len(self.queued[cpu]) > 0:
+            heapq.heappush(self.backlog[self.group[cpu]], (-self.projected[cpu], cpu))
+
+    def startNext(self, cpu, profiling):
+        # start the next job committed to the CPU, with none left take over a job of
+        # another CPU, a CPU left idle goes on with its own jobs the same way
+        while cpu is not None:
+            if len(self.queued[cpu]) > 0:
+                self.start(self.queued[cpu].popleft(), cpu, profiling)
+                return
+            self.projected[cpu] = self.currentTime
+            cpu = self.steal(cpu, profiling)
+
+    def steal(self, cpu, profiling):
+        # move the job that gains the most, the one whose completion on the idle CPU is
+        # the most before its projected completion where it is, returns the CPU a running
+        # job left or None
+        if profiling:
+            phaseStart = perf_counter()
+        speed = self.speed[cpu]
+        bestGain = 0
+        best = None
+        for cpuClass in self.topology.classes:
+            # the last job committed to the CPU of the class free the latest
+            backlog = self.backlog[cpuClass.name]
+            while backlog and (len(self.queued[backlog[0][1]]) == 0 or -backlog[0][0] != self.projected[backlog[0][1]]):
+                heapq.heappop(backlog)
+            if backlog:
+                source = backlog[0][1]
+                gain = self.projected[source] - self.currentTime - self.queued[source][-1].RemCPUCycles * speed
+                if gain > bestGain:
+                    bestGain = gain
+                    best = (source, None)
+            # the running job of a slower class that completes the latest
+            if cpuClass.speedFactor <= speed:
+                continue
+            ev = self.running.longest(cpuClass.name)
+            if ev is None:
+                continue
+            if profiling:
+                self.profile.count("eventsScanned")
+            gain = self.migrator.gain(ev, cpu, self.currentTime)
+            if gain > bestGain:
+                bestGain = gain
+                best = (ev.cpu, ev)
+        left = None
+        if best is not None:
+            source, ev = best
+            if ev is None:
+                # a committed job, the jobs before it on the source CPU keep their times
+                process = self.queued[source].pop()
+                self.projected[source] -= process.RemCPUCycles * self.speed[source]
+            else:
+                process = self.migrator.take(self.running, self.events, ev, self.currentTime)
+                self.projected[source] -= ev.timestamp - self.currentTime
+                if self.trace.events:
+                    self.trace.complete(self.currentTime, process, self.topology.names[source])
+                left = source
+            self.pushBacklog(source)
+            self.start(process, cpu, profiling)
+            self.projected[cpu] = self.currentTime + process.RemCPUCycles * speed
+            if profiling:
+                self.profile.count("migrations")
+        if profiling:
+            self.profile.add("migration", phaseStart)
+        return left
+
+    def run(self):
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        self.migrator = Migrator(self.speed, self.migrationCost)
+        # commit all the processes, longest first, then run them shortest first on each CPU
+        if profiling:
+            phaseStart = perf_counter()
+        shortestFirst = []
+        while len(self.incomingProcesses) > 0:
+            shortestFirst.append(self.incomingProcesses.pop())
+        for process in reversed(shortestFirst):
+            self.commit(process)
+        for cpu in self.CPUs:
+            self.queued[cpu] = deque(sorted(self.queued[cpu], key=lambda process: process.RemCPUCycles))
+        if profiling:
+            self.profile.add("readySelection", phaseStart)
+        for cpu in self.CPUs:
+            self.pushBacklog(cpu)
+        for cpu in self.CPUs:
+            self.startNext(cpu, profiling)
+        while not self.isDone():
+            # take the event with the smallest time off the queue
+            if profiling:
+                phaseStart = perf_counter()
+            minTimeEvent = self.events.pop()
+            if profiling:
+                self.profile.add("eventSelection", phaseStart)
+                self.profile.count("eventsScanned")
+            # advance our simulation time to the event
+            self.currentTime = minTimeEvent.timestamp
+            process = minTimeEvent.process
+            cpu = minTimeEvent.cpu
+            self.running.remove(minTimeEvent)
+            # put the process to completed
+            process.RemCPUCycles = 0
+            # completed at this time of the simulation
+            process.completedTime = self.currentTime
+            self.completed.add(process)
+            if profiling:
+                self.profile.count("completions")
+            if self.trace.events:
+                self.trace.complete(self.currentTime, process, self.topology.names[cpu])
+            # the CPU goes on with the next job committed to it
+            self.startNext(cpu, profiling)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        stats["makespan"] = self.currentTime / CLOCK
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
+
+    def printStats(self):
+        stats = self.stats()
+        print("Statistics:")
+        # print the averages
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        print("Makespan (seconds at 4GHz): {}".format(stats["makespan"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
+
+def queueProcesses(simo, processes):
+    # place Process-like objects, e.g. the rows of a ProcessTable, in the queue
+    for process in processes:
+        simo.incomingProcesses.append(process)
+
+
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation
+    # create a process for each row, place in the queue
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize) for PID, CPUCycles, MemorySize, Arrival in rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--migration-cost", type=int, default=Simulation.migrationCost, help="cycles a running job migrated to another CPU runs again")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
+    # create a simulation instance
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    simo.migrationCost = args.migration_cost
+    addProcesses(simo, readWorkload(workloadPath))
+    # processes are read, ready to run
+    simo.run()
+    simo.printStats()
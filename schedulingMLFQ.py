@@ -0,0 +1,379 @@
+import argparse
+from collections import deque
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from workload import streamArrivals
+from runningindex import RunningJobIndex
+
+
+# Multi-level feedback queue, Round Robin on a number of priority levels
+# - a process arrives at the top level, level 0
+# - the CPUs take the processes of the highest level that has any, FIFO in the level
+# - level l runs a quantum of TimeQuantum * QuantumMultiplier ** l, a process that
+#   uses up its quantum goes down a level, the bottom level is plain Round Robin
+# - a process that arrives when all the CPUs are busy takes the CPU of a running
+#   process of the lowest level below the top, that one keeps its level and goes to
+#   the back of its queue with the cycles it has left
+# - every BoostInterval all the processes go back to the top level, so the long
+#   ones are not starved by a stream of short ones, 0 for no boost, the next boost
+#   is not before the processes waiting could all have run down the levels above the
+#   bottom once, a boost sooner than that keeps an overloaded simulation at the top
+#   quanta and the dispatches grow with the square of the processes
+# short jobs complete within the small quanta of the top levels and do not wait
+# behind the long ones, without the simulation knowing the job lengths
+# every level is a LevelQueue, a FIFO of segments, a boost moves the segments of the
+# levels below to the top in O(levels) and a boost counter marks the running processes
+# as boosted, the level of each running process is kept by the simulation, so
+# any Process-like object can be scheduled, the running processes are in a
+# RunningJobIndex grouped by the level they were dispatched at, a preemption looks at
+# one process per level
+
+
+class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "startTime", "completedTime")
+
+    def __init__(self, PID, CPUCycles, MemorySize, Arrival):
+        self.PID = PID
+        self.CPUCycles = CPUCycles
+        self.MemorySize = MemorySize
+        self.RemCPUCycles = CPUCycles
+
+        # statistics for each process
+        self.arrivalTime = Arrival
+        self.startTime = None
+        self.completedTime = None
+
+    def __str__(self):
+        # returns a string for the process to be printed
+        return "PID={}, Arrival={} CPUCycles={}/{}, Size={}, Started={}, Completed={}".format(self.PID, self.arrivalTime, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
+
+class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
+    def __init__(self, process, timestamp, cpu):
+        self.process = process
+        self.timestamp = timestamp
+        self.cpu = cpu
+
+class ProcessArrivalEvent:
+    __slots__ = ("process", "timestamp")
+
+    def __init__(self, process, timestamp):
+        self.process = process
+        self.timestamp = timestamp
+
+class BoostEvent:
+    __slots__ = ("timestamp",)
+
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+class LevelQueue:
+    # FIFO of the processes of a level, a deque of segments, each a deque of processes
+    def __init__(self):
+        self.segments = deque([deque()])
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (process for segment in self.segments for process in segment)
+
+    def append(self, process):
+        self.segments[-1].append(process)
+        self.count += 1
+
+    def popleft(self):
+        while len(self.segments[0]) == 0:
+            self.segments.popleft()
+        self.count -= 1
+        return self.segments[0].popleft()
+
+    def take(self, other):
+        # move all the processes of the other queue to the back of this one, in order,
+        # O(segments of the other queue)
+        self.segments.extend(other.segments)
+        self.count += other.count
+        other.segments = deque([deque()])
+        other.count = 0
+
+def defaultTopology():
+    # 6 CPUs, the same as RR
+    return Topology([CPUClass("CPUs", 6, names=["Pa", "Pb", "Pc", "Pd", "Pe", "Pf"])])
+
+class Simulation:
+    # can be overridden per instance, e.g. by a parameter sweep
+    Levels = 3
+    # quantum of the top level, each level below has QuantumMultiplier times the one above
+    TimeQuantum = 10 ** 9
+    QuantumMultiplier = 10
+    # time between two priority boosts, 0 for none
+    BoostInterval = 10 ** 12
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
+        # one FIFO queue of processes per level, set up by run
+        self.levels = []
+        # running process -> (priority level, boosts), the level it was dispatched at,
+        # 0 is the top, and the number of boosts done then
+        self.level = {}
+        # number of boosts done
+        self.boosts = 0
+
+        self.contextSwitches = 0
+
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
+
+        # a queue of events, ordered by time
+        self.events = EventQueue()
+        # done events of the running processes, grouped by level
+        self.running = RunningJobIndex()
+        # stream of processes still to arrive, only the next one is in the event queue
+        self.arrivals = None
+        # the next priority boost in the event queue
+        self.boostEvent = None
+        # simulation time
+        self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology, all in one pool
+        self.topology = topology
+        self.CPUs = list(range(len(topology)))
+        # need a round queue of CPUs
+        self.idleCPUs = deque(self.CPUs, maxlen=len(self.CPUs))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
+
+    def waiting(self):
+        # number of processes in the queues of all the levels
+        return sum(len(queue) for queue in self.levels)
+
+    def nextBoost(self, quanta):
+        # BoostInterval from now, or later, when the processes waiting could all have
+        # run the quanta of the levels above the bottom
+        rounds = -(-self.waiting() // len(self.CPUs))
+        return self.currentTime + max(self.BoostInterval, rounds * sum(quanta[:-1]))
+
+    def levelAfter(self, process):
+        # the level a running process was dispatched at, -1 if it was boosted while it
+        # ran, so it is back at the top when it goes down a level
+        level, boosts = self.level.pop(process)
+        return level if boosts == self.boosts else -1
+
+    def isDone(self):
+        # a boost event alone is no work left
+        return len(self.events) == (1 if self.boostEvent is not None else 0) and self.waiting() == 0 and len(self.idleCPUs) == len(self.CPUs)
+
+    def addArrivals(self, arrivals):
+        # arrivals are processes in arrival time order, e.g. a generator reading a trace
+        # they are put into the event queue one at a time as the previous one arrives
+        self.arrivals = iter(arrivals)
+        self.pushNextArrival()
+
+    def pushNextArrival(self):
+        process = next(self.arrivals, None)
+        if process is None:
+            return
+        if process.arrivalTime < self.currentTime:
+            raise ValueError("Process {} arrives at {}, before the simulation time {}".format(process.PID, process.arrivalTime, self.currentTime))
+        # before the completions at the same time, as with all the arrivals queued up front
+        self.events.pushFirst(ProcessArrivalEvent(process, process.arrivalTime))
+
+    def boost(self):
+        # all the waiting processes go to the back of the top level queue, in level order,
+        # the running ones are back at the top when they leave the CPU, O(levels)
+        top = self.levels[0]
+        for queue in self.levels[1:]:
+            top.take(queue)
+        self.boosts += 1
+
+    def preempt(self, profiling):
+        # a process arrived at the top level and all the CPUs are busy, take the CPU of
+        # a running process of the lowest level below the top, returns True if one was found
+        for level in range(self.Levels - 1, 0, -1):
+            ev = self.running.longest(level)
+            if ev is None:
+                continue
+            if profiling:
+                self.profile.count("eventsScanned")
+            # remove the event from the queue, the handle is only marked as cancelled
+            self.events.cancel(self.running.remove(ev))
+            process = ev.process
+            process.RemCPUCycles -= (self.currentTime - process.startTime) // self.speed[ev.cpu]
+            if self.trace.events:
+                self.trace.complete(self.currentTime, process, self.topology.names[ev.cpu])
+            # it keeps its level, a process boosted while running is back at the top
+            self.levels[max(self.levelAfter(process), 0)].append(process)
+            self.idleCPUs.append(ev.cpu)
+            return True
+        return False
+
+    def run(self):
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        quanta = [self.TimeQuantum * self.QuantumMultiplier ** level for level in range(self.Levels)]
+        self.levels = [LevelQueue() for level in range(self.Levels)]
+        if self.BoostInterval:
+            self.boostEvent = BoostEvent(self.nextBoost(quanta))
+            self.events.push(self.boostEvent)
+        # the highest level that may have processes, only ever goes down between dispatches
+        top = 0
+        while not self.isDone():
+            # the highest level with a process waiting
+            while top < self.Levels and len(self.levels[top]) == 0:
+                top += 1
+            # check if there is any CPU idle and a process incoming
+            if top < self.Levels and len(self.idleCPUs) > 0:
+                # get the CPU, first in the queue
+                cpu = self.idleCPUs.popleft()
+                # get the process, first of its level
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.levels[top].popleft()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
+                self.level[process] = (top, self.boosts)
+                process.startTime = self.currentTime
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
+                # place an event to remove the process from the CPU after the quantum of
+                # its level, even if it is not complete
+                completedEvent = ProcessDoneEvent(process, self.currentTime + min(quanta[top], process.RemCPUCycles * self.speed[cpu]), cpu)
+                # put an event to the queue
+                handle = self.events.push(completedEvent)
+                self.running.add(completedEvent, top, handle)
+                self.contextSwitches += 1
+            else:
+                # no more idle CPUs or processes
+                # take the event with the smallest time off the queue
+                if profiling:
+                    phaseStart = perf_counter()
+                minTimeEvent = self.events.pop()
+                if profiling:
+                    self.profile.add("eventSelection", phaseStart)
+                    self.profile.count("eventsScanned")
+                # advance our simulation time to the event
+                self.currentTime = minTimeEvent.timestamp
+                if type(minTimeEvent) == BoostEvent:
+                    self.boost()
+                    top = 0
+                    self.boostEvent = BoostEvent(self.nextBoost(quanta))
+                    self.events.push(self.boostEvent)
+                    continue
+                process = minTimeEvent.process
+                if type(minTimeEvent) == ProcessArrivalEvent:
+                    if profiling:
+                        self.profile.count("arrivals")
+                    # the next process from the stream is due
+                    if self.arrivals is not None:
+                        self.pushNextArrival()
+                    self.levels[0].append(process)
+                    top = 0
+                    if len(self.idleCPUs) == 0:
+                        if profiling:
+                            phaseStart = perf_counter()
+                        if self.preempt(profiling) and profiling:
+                            self.profile.count("preemptions")
+                        if profiling:
+                            self.profile.add("preemption", phaseStart)
+                    continue
+                cpu = minTimeEvent.cpu
+                self.running.remove(minTimeEvent)
+                # check the process remaining CPUCycles, the quantum is the one of the
+                # level it was dispatched at
+                quantum = minTimeEvent.timestamp - process.startTime
+                if process.RemCPUCycles * self.speed[cpu] <= quantum:
+                    # the process was completed in the last time quantum
+                    process.RemCPUCycles = 0
+                    # completed at this time of the simulation
+                    process.completedTime = self.currentTime
+                    self.completed.add(process)
+                    del self.level[process]
+                    if profiling:
+                        self.profile.count("completions")
+                else:
+                    # subtract the number of cycles run in the quantum
+                    process.RemCPUCycles -= quantum // self.speed[cpu]
+                    # the quantum is used up, down a level, a process boosted while
+                    # running goes back to the top
+                    level = min(self.levelAfter(process) + 1, self.Levels - 1)
+                    self.levels[level].append(process)
+                    top = min(top, level)
+                    if profiling:
+                        self.profile.count("preemptions")
+                if self.trace.events:
+                    self.trace.complete(self.currentTime, process, self.topology.names[cpu])
+                # put the CPU back to idle
+                self.idleCPUs.append(cpu)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
+
+    def printStats(self):
+        stats = self.stats()
+        print("Statistics:")
+        # print the averages
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
+
+def queueProcesses(simo, processes):
+    # Process-like objects, e.g. the rows of a ProcessTable, in arrival time order
+    simo.addArrivals(processes)
+
+
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation, rows must be in arrival time order
+    # the processes are created as the simulation gets to them
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize, Arrival) for PID, CPUCycles, MemorySize, Arrival in rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--levels", type=int, default=Simulation.Levels, help="number of priority levels")
+    parser.add_argument("--quantum", type=int, default=Simulation.TimeQuantum, help="quantum of the top level in cycles")
+    parser.add_argument("--multiplier", type=int, default=Simulation.QuantumMultiplier, help="quantum of a level over the one above")
+    parser.add_argument("--boost", type=int, default=Simulation.BoostInterval, help="cycles between priority boosts, 0 for none")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
+    # create a simulation instance
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    simo.Levels = args.levels
+    simo.TimeQuantum = args.quantum
+    simo.QuantumMultiplier = args.multiplier
+    simo.BoostInterval = args.boost
+    # read the processes in arrival order, as the simulation gets to them
+    addProcesses(simo, streamArrivals(workloadPath))
+    simo.run()
+    simo.printStats()
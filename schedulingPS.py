@@ -0,0 +1,184 @@
+import argparse
+import heapq
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from workload import readWorkload
+
+
+# Processor sharing, Round Robin in the limit of a tiny time quantum
+# the CPUs are shared equally by all the jobs that are in the system, with n jobs on
+# k CPUs every job runs at k / n of a CPU, or on a CPU of its own when n <= k
+# there are no events per quantum, the simulation goes from one arrival or completion
+# epoch to the next one:
+# - between two epochs every job gets the same number of cycles, the virtual time
+#   below, so a job completes when the virtual time reaches the virtual time at its
+#   arrival plus its cycles
+# - the jobs are in a heap ordered by that completion virtual time, the next
+#   completion is the top of the heap, O(log n) per arrival and completion
+# with CPUs of different speeds the jobs share the capacity of all the CPUs, or of
+# the n fastest ones when n <= k
+# like RR every job arrives at 0 unless useArrivals is set, there are no context
+# switches, the times are rounded to whole cycles
+
+
+class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "completedTime")
+
+    def __init__(self, PID, CPUCycles, MemorySize, Arrival=0):
+        self.PID = PID
+        self.CPUCycles = CPUCycles
+        self.MemorySize = MemorySize
+        self.RemCPUCycles = CPUCycles
+
+        # statistics for each process
+        self.arrivalTime = Arrival
+        self.completedTime = None
+
+    def __str__(self):
+        # returns a string for the process to be printed
+        return "PID={}, Arrival={}, CPUCycles={}/{}, Size={}, Completed={}".format(self.PID, self.arrivalTime, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.completedTime)
+
+def defaultTopology():
+    # 6 CPUs, the same as RR
+    return Topology([CPUClass("CPUs", 6, names=["Pa", "Pb", "Pc", "Pd", "Pe", "Pf"])])
+
+class Simulation:
+    # can be overridden per instance, use the arrival times of the workload
+    useArrivals = False
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
+        # processes still to arrive
+        self.incomingProcesses = []
+
+        # there are none, kept for the same statistics as the other simulations
+        self.contextSwitches = 0
+
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
+
+        # simulation time
+        self.currentTime = 0
+        # trace output, by default every arrival and completion is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the cycles per unit of time of each CPU, fastest first
+        self.topology = topology
+        rates = sorted((1 / speed for speed in topology.speed), reverse=True)
+        # capacity[n] is the cycles per unit of time of the n fastest CPUs
+        self.capacity = [0]
+        for rate in rates:
+            self.capacity.append(self.capacity[-1] + rate)
+
+    def share(self, jobs):
+        # the cycles per unit of time each of the jobs gets
+        return self.capacity[min(jobs, len(self.capacity) - 1)] / jobs
+
+    def isDone(self):
+        return len(self.incomingProcesses) == 0
+
+    def run(self):
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        # in arrival order, the same as the queue order for the same arrival times
+        arrivals = sorted(self.incomingProcesses, key=lambda process: process.arrivalTime)
+        self.incomingProcesses = []
+        # heap of (completion virtual time, arrival order, process) of the jobs in the system
+        running = []
+        # cycles every job in the system has had since the start
+        virtualTime = 0
+        time = self.currentTime
+        nextArrival = 0
+        while nextArrival < len(arrivals) or running:
+            arrivalTime = arrivals[nextArrival].arrivalTime if nextArrival < len(arrivals) else None
+            if running:
+                rate = self.share(len(running))
+                completionTime = time + (running[0][0] - virtualTime) / rate
+            if not running or (arrivalTime is not None and arrivalTime <= completionTime):
+                # the next epoch is an arrival, the job joins the others
+                process = arrivals[nextArrival]
+                if running:
+                    virtualTime += (arrivalTime - time) * rate
+                time = max(time, arrivalTime)
+                heapq.heappush(running, (virtualTime + process.CPUCycles, nextArrival, process))
+                nextArrival += 1
+                if profiling:
+                    self.profile.count("arrivals")
+                if self.trace.events:
+                    self.trace.start(round(time), process, "PS")
+            else:
+                # the next epoch is a completion, the job with the fewest cycles left
+                virtualTime, order, process = heapq.heappop(running)
+                time = completionTime
+                process.RemCPUCycles = 0
+                # completed at this time of the simulation
+                process.completedTime = round(time)
+                self.completed.add(process)
+                if profiling:
+                    self.profile.count("completions")
+                if self.trace.events:
+                    self.trace.complete(process.completedTime, process, "PS")
+            if profiling:
+                self.profile.count("eventsScanned")
+        self.currentTime = round(time)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
+
+    def printStats(self):
+        stats = self.stats()
+        print("Statistics:")
+        # print the averages
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
+
+def queueProcesses(simo, processes):
+    # place Process-like objects, e.g. the rows of a ProcessTable, in the queue
+    simo.incomingProcesses.extend(processes)
+
+
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation
+    # create a process for each row, place in the queue, at 0 unless useArrivals is set
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize, Arrival if simo.useArrivals else 0) for PID, CPUCycles, MemorySize, Arrival in rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--arrivals", action="store_true", help="use the arrival times of the workload, by default every job arrives at 0 like RR")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
+    # create a simulation instance
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    simo.useArrivals = args.arrivals
+    addProcesses(simo, readWorkload(workloadPath))
+    # processes are read, ready to run
+    simo.run()
+    simo.printStats()
@@ -1,9 +1,20 @@
-import csv
+import argparse
+import math
 import random
 from random import randint
 from collections import deque
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from workload import readWorkload
 
 class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "completedTime")
+
     def __init__(self, PID, CPUCycles, MemorySize):
         self.PID = PID
         self.CPUCycles = CPUCycles
@@ -20,117 +31,249 @@ class Process:
         return "PID={}, CPUCycles={}/{}, Size={}, Completed={}".format(self.PID, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.completedTime)
 
 class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
     def __init__(self, process, timestamp, cpu):
         self.process = process
         self.timestamp = timestamp
         self.cpu = cpu
 
+def defaultTopology():
+    # 6 CPUs
+    return Topology([CPUClass("CPUs", 6, names=["Pa", "Pb", "Pc", "Pd", "Pe", "Pf"])])
+
 class Simulation:
+    # can be overridden per instance, e.g. by a parameter sweep
     TimeQuantum = 10 ** 10
-    def __init__(self):
-        # 6 CPUs
-        self.CPUs = ["Pa", "Pb", "Pc", "Pd", "Pe", "Pf"]
-        # need a round queue of CPUs
-        self.idleCPUs = deque(self.CPUs, maxlen=len(self.CPUs))
+    # skip quanta where the schedule is known ahead, see canSkipQuanta
+    quantumSkipping = True
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
         # incoming process queue, to be assigned to CPUs
         self.incomingProcesses = deque()
 
         self.contextSwitches = 0
 
-        # list of completed processes
-        self.completedProcess = []
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
 
-        # a queue of events
-        self.events = []
+        # a queue of events, ordered by time
+        self.events = EventQueue()
         # simulation time
         self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology, all in one pool
+        self.topology = topology
+        self.CPUs = list(range(len(topology)))
+        # need a round queue of CPUs
+        self.idleCPUs = deque(self.CPUs, maxlen=len(self.CPUs))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
+
+    def canSkipQuanta(self):
+        # all the processes are there at the start, so nothing new comes in and:
+        # - once the processes left fit on the CPUs each one gets a CPU back as soon as
+        #   its quantum is over, every quantum until it completes, see skipQuanta
+        # - while there are more processes than CPUs they take turns in a fixed order,
+        #   see skipCycles
+        # the quanta are only skipped when that gives exactly the same results, with
+        # integer cycles, the same speed on all the CPUs and no trace of the events
+        speeds = set(self.speed)
+        if not self.quantumSkipping or self.trace.events or len(speeds) != 1:
+            return False
+        speed = speeds.pop()
+        return isinstance(self.TimeQuantum, int) and isinstance(speed, int) and 0 < speed <= self.TimeQuantum
+
+    def skipQuanta(self, process, cpu):
+        # run the process through all its quanta but the last, returns the number of quanta
+        cyclesPerQuantum = self.TimeQuantum // self.speed[cpu]
+        quanta = (process.RemCPUCycles - 1) // cyclesPerQuantum
+        process.RemCPUCycles -= quanta * cyclesPerQuantum
+        return quanta
+
+    def skipCycles(self):
+        # n processes on k busy CPUs: every expired process goes to the back of the queue
+        # and the one in front takes its CPU, so the processes are dispatched in the same
+        # order over and over, every k dispatches a quantum later
+        # after lcm(n, k) dispatches every process has had lcm(n, k) / n quanta and each
+        # is on the same CPU or at the same place in the queue as before, so whole
+        # cycles are skipped while no process completes in them, returns the quanta skipped
+        running = list(self.events)
+        n = len(self.incomingProcesses) + len(running)
+        k = len(running)
+        cycle = n * k // math.gcd(n, k)
+        speed = self.speed[running[0].cpu]
+        cyclesPerQuantum = self.TimeQuantum // speed
+        # quanta each process can run before its last one, the quanta dispatched in the
+        # skipped cycles must all be full ones, including those still running after them
+        fullQuanta = (min(min(process.RemCPUCycles for process in self.incomingProcesses), min(ev.process.RemCPUCycles for ev in running)) - 1) // cyclesPerQuantum
+        cycles = (fullQuanta - 1) // (cycle // n)
+        if cycles <= 0:
+            return 0
+        skipped = cycles * cycle // n * cyclesPerQuantum
+        shift = cycles * cycle // k * self.TimeQuantum
+        for process in self.incomingProcesses:
+            process.RemCPUCycles -= skipped
+        # the running processes are put back in the order they were dispatched
+        self.events = EventQueue()
+        for ev in running:
+            ev.process.RemCPUCycles -= skipped
+            ev.timestamp += shift
+            self.events.push(ev)
+        self.currentTime += shift
+        self.contextSwitches += cycles * cycle
+        return cycles * cycle
 
     def isDone(self):
         return len(self.incomingProcesses) == 0 and len(self.idleCPUs) == len(self.CPUs)
 
     def run(self):
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        skipping = self.canSkipQuanta()
+        # events until the next try of skipCycles
+        untilSkip = 0
         while not self.isDone():
             # check if there is any CPU idle and a process incoming
             if len(self.incomingProcesses) > 0 and len(self.idleCPUs) > 0:
                 # get the CPU, first in the queue
                 cpu = self.idleCPUs.popleft()
                 # get the process
+                if profiling:
+                    phaseStart = perf_counter()
                 process = self.incomingProcesses.popleft()
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
+                startTime = self.currentTime
+                # no other process is waiting or running on every CPU, so this one
+                # runs alone, go straight to its last quantum, with a context switch
+                # for every quantum skipped
+                if skipping and len(self.incomingProcesses) + len(self.events) < len(self.CPUs):
+                    quanta = self.skipQuanta(process, cpu)
+                    startTime += quanta * self.TimeQuantum
+                    self.contextSwitches += quanta
+                    if profiling:
+                        self.profile.count("dispatches", quanta)
+                        self.profile.count("preemptions", quanta)
+                        self.profile.count("skippedQuanta", quanta)
                 # place an even to remove the process from the queue after time quantum
                 # even if it is not complete
-                completedEvent = ProcessDoneEvent(process, self.currentTime + min(Simulation.TimeQuantum, process.RemCPUCycles), cpu)
+                completedEvent = ProcessDoneEvent(process, startTime + min(self.TimeQuantum, process.RemCPUCycles * self.speed[cpu]), cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                self.events.push(completedEvent)
                 self.contextSwitches += 1
             else:
+                if skipping and len(self.idleCPUs) == 0 and len(self.incomingProcesses) > 0:
+                    untilSkip -= 1
+                    if untilSkip <= 0:
+                        # a try looks at every process, so the next one is a round of
+                        # the processes later at the earliest
+                        untilSkip = len(self.incomingProcesses) + len(self.events)
+                        quanta = self.skipCycles()
+                        if profiling:
+                            self.profile.count("dispatches", quanta)
+                            self.profile.count("preemptions", quanta)
+                            self.profile.count("skippedQuanta", quanta)
                 # no more idle CPUs or processes
                 # check the event when the next process is complete
-                # find the event with the smallest time
-                minTimeEventIndex = 0
-                for i, ev in enumerate(self.events):
-                    if ev.timestamp < self.events[minTimeEventIndex].timestamp:
-                        minTimeEventIndex = i
-                minTimeEvent = self.events[minTimeEventIndex]
-                # remove the event from queue
-                self.events.pop(minTimeEventIndex)
+                # take the event with the smallest time off the queue
+                if profiling:
+                    phaseStart = perf_counter()
+                minTimeEvent = self.events.pop()
+                if profiling:
+                    self.profile.add("eventSelection", phaseStart)
+                    self.profile.count("eventsScanned")
                 # advance our simulation time to the event
                 self.currentTime = minTimeEvent.timestamp
                 process = minTimeEvent.process
                 cpu = minTimeEvent.cpu
                 # check the process remaining CPUCycles
-                if process.RemCPUCycles <= Simulation.TimeQuantum:
+                if process.RemCPUCycles * self.speed[cpu] <= self.TimeQuantum:
                     # the process was completed in the last time quantum
                     # put the process to completed
                     process.RemCPUCycles = 0
                     # completed at this time of the simulation
                     process.completedTime = self.currentTime 
-                    self.completedProcess.append(process)
+                    self.completed.add(process)
+                    if profiling:
+                        self.profile.count("completions")
                 else:
-                    # subtract the number of cycles from the quantum
-                    process.RemCPUCycles -= Simulation.TimeQuantum
+                    # subtract the number of cycles run in the quantum
+                    process.RemCPUCycles -= self.TimeQuantum // self.speed[cpu]
                     # place back to the incoming queue
                     self.incomingProcesses.append(process)
-                print("Simo time {}: Process {} completes on CPU {}".format(self.currentTime, process, cpu))
+                    if profiling:
+                        self.profile.count("preemptions")
+                if self.trace.events:
+                    self.trace.complete(self.currentTime, process, self.topology.names[cpu])
                 # put the CPU back to idle
                 self.idleCPUs.append(cpu)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
 
 
 
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
 
     def printStats(self):
+        stats = self.stats()
         print("Statistics:")
-        nProcesses = len(self.completedProcess)
-        totalWaitTime = 0
-        totalTurnAroundTime = 0
-        for process in self.completedProcess:
-            turnAroundTime = process.completedTime - process.arrivalTime
-            totalTurnAroundTime += turnAroundTime
-            waitTime = turnAroundTime - process.CPUCycles
-            totalWaitTime += waitTime
         # print the averages
-        print("Average wait time (seconds at 4GHz): {}".format(totalWaitTime / nProcesses / 4E9))
-        print("Average turnaround time (seconds at 4GHz): {}".format(totalTurnAroundTime / nProcesses / 4E9))
-        print("Context switches: {}".format(self.contextSwitches))
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
+
+
+
 
 
+def queueProcesses(simo, processes):
+    # place Process-like objects, e.g. the rows of a ProcessTable, in the queue
+    for process in processes:
+        simo.incomingProcesses.append(process)
 
 
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation
+    # create a process for each row, place in the queue
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize) for PID, CPUCycles, MemorySize, Arrival in rows))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
     # create a simulation instance
-    simo = Simulation()
-    with open('processes8_16_arrival.csv') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        csvit = iter(csv_reader)
-        csvHeader = next(csvit)
-        for PID, CPUCycles, MemorySize, Arrival in csvit:
-            PID = int(PID)
-            CPUCycles = int(CPUCycles)
-            MemorySize = int(MemorySize)
-            # create a process, place in the queue
-            simo.incomingProcesses.append(Process(PID, CPUCycles, MemorySize))
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    addProcesses(simo, readWorkload(workloadPath))
     # processes are read, ready to run
     simo.run()
     simo.printStats()
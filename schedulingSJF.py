@@ -1,9 +1,22 @@
-import csv
+import argparse
 import random
 from random import randint
 from collections import deque
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from predictors import makePredictor
+from workload import readWorkload
+from batchschedule import runBatch
+from readyqueue import PredictedJobQueue, ShortestJobQueue
 
 class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "startTime", "completedTime")
+
     def __init__(self, PID, CPUCycles, MemorySize):
         self.PID = PID
         self.CPUCycles = CPUCycles
@@ -20,64 +33,106 @@ class Process:
         return "PID={}, CPUCycles={}, Size={}, Started={}, Completed={}".format(self.PID, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
 
 class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
     def __init__(self, process, timestamp, cpu):
         self.process = process
         self.timestamp = timestamp
         self.cpu = cpu
 
+def defaultTopology():
+    # 6 CPUs
+    return Topology([CPUClass("CPUs", 6, names=["Pa", "Pb", "Pc", "Pd", "Pe", "Pf"])])
+
 class Simulation:
-    def __init__(self):
-        # 6 CPUs
-        self.CPUs = ["Pa", "Pb", "Pc", "Pd", "Pe", "Pf"]
-        # need a round queue of CPUs
-        self.idleCPUs = deque(self.CPUs, maxlen=len(self.CPUs))
-        # incoming process queue, to be assigned to CPUs
-        self.incomingProcesses = []
+    # can be overridden per instance, compute the schedule in one go when every job
+    # is there at the start, see batchschedule
+    batchMode = True
+    # the job lengths the queue is ordered on, see predictors, oracle for the true ones
+    predictor = "oracle"
+    predictionAlpha = 0.5
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
+        # incoming process queue, to be assigned to CPUs, shortest job first
+        self.incomingProcesses = ShortestJobQueue()
 
         self.contextSwitches = 0
+        # the predictor of the run, None for the true lengths
+        self.lengthPredictor = None
 
-        # list of completed processes
-        self.completedProcess = []
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
 
-        # a queue of events
-        self.events = []
+        # a queue of events, ordered by time
+        self.events = EventQueue()
         # simulation time
         self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology, all in one pool
+        self.topology = topology
+        self.CPUs = list(range(len(topology)))
+        # need a round queue of CPUs
+        self.idleCPUs = deque(self.CPUs, maxlen=len(self.CPUs))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
 
     def isDone(self):
         return len(self.incomingProcesses) == 0 and len(self.idleCPUs) == len(self.CPUs)
 
     def run(self):
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        if self.predictor != "oracle":
+            # order the queue on the predicted lengths at the time a job is taken out
+            self.lengthPredictor = makePredictor(self.predictor, self.predictionAlpha, self.topology.smallMemory())
+            self.incomingProcesses = PredictedJobQueue(self.incomingProcesses, self.lengthPredictor)
+        processes = len(self.incomingProcesses)
+        if self.batchMode and self.lengthPredictor is None and runBatch(self, list(self.incomingProcesses), shortestFirst=True):
+            # the processes are all done
+            self.incomingProcesses = ShortestJobQueue()
+            if profiling:
+                self.profile.count("dispatches", processes)
+                self.profile.count("completions", processes)
+                self.profile.count("batchJobs", processes)
         while not self.isDone():
             # check if there is any CPU idle and a process incoming
             if len(self.incomingProcesses) > 0 and len(self.idleCPUs) > 0:
                 # get the CPU, first in the queue
                 cpu = self.idleCPUs.popleft()
                 # get the shortest process of remaining
-                shortestProcessIndex = 0
-                for i, process in enumerate(self.incomingProcesses):
-                    if process.RemCPUCycles < self.incomingProcesses[shortestProcessIndex].RemCPUCycles:
-                        shortestProcessIndex = i
-                # get that shortest index
-                process = self.incomingProcesses.pop(shortestProcessIndex)
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incomingProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
                 # set the time when the process is complete
                 process.startTime = self.currentTime
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
-                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles, cpu)
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
+                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                self.events.push(completedEvent)
                 self.contextSwitches += 1
             else:
                 # no more idle CPUs or processes
                 # check the event when the next process is complete
-                # find the event with the smallest time
-                minTimeEventIndex = 0
-                for i, ev in enumerate(self.events):
-                    if ev.timestamp < self.events[minTimeEventIndex].timestamp:
-                        minTimeEventIndex = i
-                minTimeEvent = self.events[minTimeEventIndex]
-                # remove the event from queue
-                self.events.pop(minTimeEventIndex)
+                # take the event with the smallest time off the queue
+                if profiling:
+                    phaseStart = perf_counter()
+                minTimeEvent = self.events.pop()
+                if profiling:
+                    self.profile.add("eventSelection", phaseStart)
+                    self.profile.count("eventsScanned")
                 # advance our simulation time to the event
                 self.currentTime = minTimeEvent.timestamp
                 process = minTimeEvent.process
@@ -87,46 +142,68 @@ class Simulation:
                 process.RemCPUCycles = 0
                 # completed at this time of the simulation
                 process.completedTime = self.currentTime 
-                self.completedProcess.append(process)
-                print("Simo time {}: Process {} completes on CPU {}".format(self.currentTime, process, cpu))
+                self.completed.add(process)
+                if self.lengthPredictor is not None:
+                    self.lengthPredictor.observe(process)
+                if profiling:
+                    self.profile.count("completions")
+                if self.trace.events:
+                    self.trace.complete(self.currentTime, process, self.topology.names[cpu])
                 # put the CPU back to idle
                 self.idleCPUs.append(cpu)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
 
 
 
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
 
     def printStats(self):
+        stats = self.stats()
         print("Statistics:")
-        nProcesses = len(self.completedProcess)
-        totalWaitTime = 0
-        totalTurnAroundTime = 0
-        for process in self.completedProcess:
-            turnAroundTime = process.completedTime - process.arrivalTime
-            totalTurnAroundTime += turnAroundTime
-            waitTime = turnAroundTime - process.CPUCycles
-            totalWaitTime += waitTime
         # print the averages
-        print("Average wait time (seconds at 4GHz): {}".format(totalWaitTime / nProcesses / 4E9))
-        print("Average turnaround time (seconds at 4GHz): {}".format(totalTurnAroundTime / nProcesses / 4E9))
-        print("Context switches: {}".format(self.contextSwitches))
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
+
+
+
 
+def queueProcesses(simo, processes):
+    # place Process-like objects, e.g. the rows of a ProcessTable, in the queue
+    for process in processes:
+        simo.incomingProcesses.append(process)
 
 
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation
+    # create a process for each row, place in the queue
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize) for PID, CPUCycles, MemorySize, Arrival in rows))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
     # create a simulation instance
-    simo = Simulation()
-    with open('processes8_16_arrival.csv') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        csvit = iter(csv_reader)
-        csvHeader = next(csvit)
-        for PID, CPUCycles, MemorySize, Arrival in csvit:
-            PID = int(PID)
-            CPUCycles = int(CPUCycles)
-            MemorySize = int(MemorySize)
-            # create a process, place in the queue
-            simo.incomingProcesses.append(Process(PID, CPUCycles, MemorySize))
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    addProcesses(simo, readWorkload(workloadPath))
     # processes are read, ready to run
     simo.run()
     simo.printStats()
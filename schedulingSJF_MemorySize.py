@@ -1,8 +1,18 @@
 from asyncio import events
-import csv
+import argparse
 import random
 from random import randint
 from collections import deque
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from workload import readWorkload
+from readyqueue import ShortestJobQueue
+from runningindex import RunningJobIndex
+from migration import Migrator
 
 
 # Break the jobs into the following lists
@@ -13,9 +23,14 @@ from collections import deque
 # Put jobs from list 2 on 16 GB CPUs as they become available
 # Put shorter jobs on slower CPUs if there are more jobs than fast CPUs
 # As there are no more jobs from list 2, start placing jobs from list 1 on the 16GB CPUs
+# A CPU with no more jobs it can run takes over the running job that gains the most
+# from moving to it, see migration, migrationCost is the cycles a moved job runs again
 
 
 class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "startTime", "completedTime")
+
     def __init__(self, PID, CPUCycles, MemorySize, Arrival):
         self.PID = PID
         self.CPUCycles = CPUCycles
@@ -32,44 +47,128 @@ class Process:
         return "PID={}, Arrival={} CPUCycles={}/{}, Size={}, Started={}, Completed={}".format(self.PID, self.arrivalTime, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
 
 class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
     def __init__(self, process, timestamp, cpu):
         self.process = process
         self.timestamp = timestamp
         self.cpu = cpu
 
+def defaultTopology():
+    # 6 CPUs, the 8GB CPUs are slow and small, 2x slower, 2GHz vs 4GHz
+    return Topology([
+        CPUClass("8GB", 3, speedFactor=2, memory=8, names=["Pa", "Pb", "Pc"]),
+        CPUClass("16GB", 3, speedFactor=1, memory=16, names=["Pd", "Pe", "Pf"]),
+    ])
+
 class Simulation:
-    def __init__(self):
-        # 6 CPUs
-        self.CPUs_8GB = ["Pa", "Pb", "Pc"]  # slow and small CPUs
-        self.CPUs_16GB = ["Pd", "Pe", "Pf"]  # fast and large CPUs
-        self.slowCPUFactor = 2 # a multiple for time to spend on slower CPU, a slow CPU is 2x slower, 2GHz vs 4GHz
-        # need a round queue of CPUs
-        self.idle8GBCPUs = deque(self.CPUs_8GB, maxlen=len(self.CPUs_8GB))
-        self.idle16GBCPUs = deque(self.CPUs_16GB, maxlen=len(self.CPUs_16GB))
+    # cycles a job migrated to another CPU has to run again
+    migrationCost = 0
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
 
-        self.incoming8GBProcesses = []
-        self.incoming16GBProcesses = []
+        # incoming process queues, shortest job first
+        self.incoming8GBProcesses = ShortestJobQueue()
+        self.incoming16GBProcesses = ShortestJobQueue()
 
         self.contextSwitches = 0
         
 
-        # list of completed processes
-        self.completedProcess = []
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
 
-        # a queue of events
-        self.events = []
+        # a queue of events, ordered by time
+        self.events = EventQueue()
+        # done events of the running jobs, grouped by (CPU class, memory class)
+        self.running = RunningJobIndex()
+        # picks the running job an idle CPU takes over, made in run from migrationCost
+        self.migrator = None
         # simulation time
         self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology, the classes with the most
+        # memory are the 16GB CPUs, all the others are the 8GB CPUs
+        self.topology = topology
+        smallClasses, largeClasses = topology.memoryTiers()
+        self.CPUs_8GB = topology.cpus(smallClasses)
+        self.CPUs_16GB = topology.cpus(largeClasses)
+        # need a round queue of CPUs
+        self.idle8GBCPUs = deque(self.CPUs_8GB, maxlen=len(self.CPUs_8GB))
+        self.idle16GBCPUs = deque(self.CPUs_16GB, maxlen=len(self.CPUs_16GB))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
+        # "8GB" or "16GB" for each CPU
+        self.tier = ["8GB"] * len(topology)
+        for cpu in self.CPUs_16GB:
+            self.tier[cpu] = "16GB"
+        # jobs up to largeMemory run on the 16GB CPUs, the ones up to smallMemory on any CPU
+        self.largeMemory = largeClasses[0].memory
+        self.smallMemory = min(cpuClass.memory for cpuClass in smallClasses) if smallClasses else self.largeMemory
+        # the CPU class name of each CPU, and the running index groups of the jobs each CPU
+        # can take over, the 16GB jobs only on the 16GB CPUs
+        self.group = [cpuClass.name for cpuClass in topology.cpuClass]
+        self.stealGroups = [[(cpuClass.name, memoryClass) for cpuClass in topology.classes
+                             for memoryClass in (("8GB", "16GB") if self.tier[cpu] == "16GB" else ("8GB",))]
+                            for cpu in range(len(topology))]
 
     def isDone(self):
         return len(self.incoming8GBProcesses) == 0 and \
                 len(self.incoming16GBProcesses) == 0 and \
                 len(self.idle8GBCPUs) == len(self.CPUs_8GB) and  len(self.idle16GBCPUs) == len(self.CPUs_16GB)
 
+    def runningGroup(self, cpu, process):
+        # group of a running job in the running index, (CPU class, memory class)
+        memoryClass = "8GB" if process.MemorySize <= self.smallMemory else "16GB"
+        return (self.group[cpu], memoryClass)
+
+    def idle(self, cpu):
+        # the idle queue of the CPU's tier
+        return self.idle16GBCPUs if self.tier[cpu] == "16GB" else self.idle8GBCPUs
+
+    def canSteal(self, cpu):
+        # no job waiting that the CPU runs
+        if self.tier[cpu] == "16GB":
+            return len(self.incoming16GBProcesses) == 0
+        return len(self.incoming8GBProcesses) == 0
+
+    def steal(self, cpu, profiling):
+        # the idle CPU takes over the running job that gains the most from moving to it
+        # returns the CPU the job left, idle now, or None
+        if profiling:
+            self.profile.count("eventsScanned", len(self.stealGroups[cpu]))
+        ev = self.migrator.best(self.running, self.stealGroups[cpu], cpu, self.currentTime)
+        if ev is None:
+            return None
+        process = self.migrator.take(self.running, self.events, ev, self.currentTime)
+        # get the idle CPU, the last one put back to its queue
+        self.idle(cpu).pop()
+        # return the CPU the job leaves
+        self.idle(ev.cpu).append(ev.cpu)
+        # assign the process to the idle CPU
+        if self.trace.events:
+            self.trace.start(self.currentTime, process, self.topology.names[cpu])
+        completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
+        handle = self.events.push(completedEvent)
+        self.running.add(completedEvent, self.runningGroup(cpu, process), handle)
+        self.contextSwitches += 1
+        if profiling:
+            self.profile.count("migrations")
+            self.profile.count("dispatches")
+        return ev.cpu
+
     def run(self):
-        # sort incoming processes by time, shortest jobs first
-        self.incoming8GBProcesses.sort(key=lambda p: (p.CPUCycles, p.PID))
-        self.incoming16GBProcesses.sort(key=lambda p: (p.CPUCycles, p.PID))
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        self.migrator = Migrator(self.speed, self.migrationCost)
         while not self.isDone():
             # check if 16GB jobs is ready and 16GB CPU is availaable
             if len(self.incoming16GBProcesses) > 0 and len(self.idle16GBCPUs) > 0:
@@ -77,14 +176,21 @@ class Simulation:
                 # get the CPU
                 cpu = self.idle16GBCPUs.popleft()
                 # get that shortest remaining process
-                process = self.incoming16GBProcesses.pop(0)
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incoming16GBProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
                 # set the time when the process is complete
                 process.startTime = self.currentTime
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
                 # setup an event to get the job off the CPU
-                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles, cpu)
+                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                handle = self.events.push(completedEvent)
+                self.running.add(completedEvent, self.runningGroup(cpu, process), handle)
                 self.contextSwitches += 1
             # now assign 8GB jobs, can assing if 8GB CPU is availabe or 16GB CPU is available
             elif len(self.incoming8GBProcesses) > 0 and (len(self.idle16GBCPUs) > 0 or len(self.idle8GBCPUs) > 0):
@@ -94,118 +200,125 @@ class Simulation:
                     # but only if there are no more jobs than fast CPUs available, or slow slow CPUs avail
                     # if the fast CPU is available at this point, this means no more 16GB jobs
                     cpu = self.idle16GBCPUs.popleft()
-                    cpuTimeMultiplier = 1
+                    cpuTimeMultiplier = self.speed[cpu]
                 else:
                     cpu = self.idle8GBCPUs.popleft()
-                    cpuTimeMultiplier = self.slowCPUFactor
+                    cpuTimeMultiplier = self.speed[cpu]
                 # get that shortest remaining process
-                process = self.incoming8GBProcesses.pop(0)
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incoming8GBProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
                 # set the time when the process is complete
                 process.startTime = self.currentTime
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
                 # setup the event when the job is done
                 completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * cpuTimeMultiplier, cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                handle = self.events.push(completedEvent)
+                self.running.add(completedEvent, self.runningGroup(cpu, process), handle)
                 self.contextSwitches += 1
             else:
                 # no more idle CPUs or processes
                 # check the the even when the next process is complete
-                # find the event with the smallest time
-                minTimeEventIndex = 0
-                for i, ev in enumerate(self.events):
-                    if ev.timestamp < self.events[minTimeEventIndex].timestamp:
-                        minTimeEventIndex = i
-                minTimeEvent = self.events[minTimeEventIndex]
-                # remove the event from queue
-                self.events.pop(minTimeEventIndex)
+                # take the event with the smallest time off the queue
+                if profiling:
+                    phaseStart = perf_counter()
+                minTimeEvent = self.events.pop()
+                if profiling:
+                    self.profile.add("eventSelection", phaseStart)
+                    self.profile.count("eventsScanned")
                 # advance our simulation time to the event
                 self.currentTime = minTimeEvent.timestamp
                 process = minTimeEvent.process
                 cpu = minTimeEvent.cpu
+                self.running.remove(minTimeEvent)
 
                 # put the process to completed
                 process.RemCPUCycles = 0
                 # completed at this time of the simulation
                 process.completedTime = self.currentTime 
-                self.completedProcess.append(process)
-                print("Simo time {}: Process {} completes on CPU {}".format(self.currentTime, process, cpu))
+                self.completed.add(process)
+                if profiling:
+                    self.profile.count("completions")
+                if self.trace.events:
+                    self.trace.complete(self.currentTime, process, self.topology.names[cpu])
                 # put the CPU back to appropriate idle
-                if cpu in self.CPUs_8GB:
-                    self.idle8GBCPUs.append(cpu)
-                else:
-                    self.idle16GBCPUs.append(cpu)
-                    # fast CPU is available, see if there is anything on slow CPU to switch
-                    # check if it possible to switch a context of a process from slower CPU
-                    if len(self.incoming16GBProcesses) == 0 and len(self.idle8GBCPUs) < len(self.CPUs_8GB):
-                        # something is running on the slow CPU, lets find it
-                        slowCPUEventIndex = None
-                        for i, ev in enumerate(self.events):
-                            # if the event occurs after the current time, meaning the process is still running
-                            if ev.timestamp > self.currentTime and ev.cpu in self.CPUs_8GB:
-                                # found this event at index i
-                                slowCPUEventIndex = i
-                        # if found the latest possible event to offload
-                        if slowCPUEventIndex is not None:
-                            slowCPUEvent = self.events.pop(slowCPUEventIndex)
-                            process = slowCPUEvent.process
-                            cpu = slowCPUEvent.cpu
-                            # calculate how many cycles are left
-                            process.RemCPUCycles -= (self.currentTime - process.startTime) // self.slowCPUFactor
-                            # return the slow CPU
-                            self.idle8GBCPUs.append(cpu)
-                            # get the fast CPU
-                            cpu = self.idle16GBCPUs.popleft()
-                            # assign the process to the fast CPU
-                            print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
-                            # time is * by burstTimeMultiplier, to set the process for x2 time on slower CPU
-                            completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles, cpu)
-                            self.events.append(completedEvent)
-                            self.contextSwitches += 1
+                self.idle(cpu).append(cpu)
+                # CPU is available, see if there is anything on a slower CPU to switch
+                # the CPU the job leaves does the same while it has nothing to run
+                if self.canSteal(cpu):
+                    if profiling:
+                        phaseStart = perf_counter()
+                    while cpu is not None and self.canSteal(cpu):
+                        cpu = self.steal(cpu, profiling)
+                    if profiling:
+                        self.profile.add("migration", phaseStart)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
 
 
 
 
 
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
 
     def printStats(self):
+        stats = self.stats()
         print("Statistics:")
-        nProcesses = len(self.completedProcess)
-        totalWaitTime = 0
-        totalTurnAroundTime = 0
-        for process in self.completedProcess:
-            turnAroundTime = process.completedTime - process.arrivalTime
-            totalTurnAroundTime += turnAroundTime
-            waitTime = turnAroundTime - process.CPUCycles
-            totalWaitTime += waitTime
         # print the averages
-        print("Average wait time (seconds at 4GHz): {}".format(totalWaitTime / nProcesses / 4E9))
-        print("Average turnaround time (seconds at 4GHz): {}".format(totalTurnAroundTime / nProcesses / 4E9))
-        print("Context switches: {}".format(self.contextSwitches))
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
 
 
 
 
 
+def queueProcesses(simo, processes):
+    # place Process-like objects, e.g. the rows of a ProcessTable, in the queues
+    for process in processes:
+        if process.MemorySize <= simo.smallMemory:
+            simo.incoming8GBProcesses.append(process)
+        elif process.MemorySize <= simo.largeMemory:
+            simo.incoming16GBProcesses.append(process)
+        else:
+            print("Rejecting Process {} with memory size {} exceeding {} GB".format(process.PID, process.MemorySize, simo.largeMemory))
+
+
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation
+    # create a process for each row, place in the queue
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize, Arrival) for PID, CPUCycles, MemorySize, Arrival in rows))
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--migration-cost", type=int, default=Simulation.migrationCost, help="cycles a job migrated to another CPU runs again")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
     # create a simulation instance
-    simo = Simulation()
-    with open('processes8_16_arrival.csv') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        csvit = iter(csv_reader)
-        csvHeader = next(csvit)
-        for PID, CPUCycles, MemorySize, Arrival in csvit:
-            PID = int(PID)
-            CPUCycles = int(CPUCycles)
-            MemorySize = int(MemorySize)
-            Arrival = int(Arrival)
-            # create a process, place in the queue
-            if MemorySize <= 8:
-                simo.incoming8GBProcesses.append(Process(PID, CPUCycles, MemorySize, Arrival))
-            elif MemorySize <= 16:
-                simo.incoming16GBProcesses.append(Process(PID, CPUCycles, MemorySize, Arrival))
-            else:
-                print("Rejecting Process {} with memory size {} exceeding 16 GB".format(PID, MemorySize))
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    simo.migrationCost = args.migration_cost
+    addProcesses(simo, readWorkload(workloadPath))
     # processes are read, ready to run
     simo.run()
     simo.printStats()
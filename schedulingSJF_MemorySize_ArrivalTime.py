@@ -1,8 +1,20 @@
 from asyncio import events
-import csv
+import argparse
 import random
 from random import randint
+import heapq
 from collections import deque
+from itertools import count
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from workload import streamArrivals
+from readyqueue import ShortestJobQueue
+from runningindex import RunningJobIndex
+from migration import Migrator
 
 
 
@@ -18,9 +30,22 @@ from collections import deque
 # as the new jobs arrive, need to reevaluate what is currently running
 # Any new 16GB job replaces the longest 8GB job or longer 16GB job on the 16GB CPU
 # Any 8GB job replaces the longest remaining 8GB job on any CPU
+# A CPU with no more jobs it can run takes over the running job that gains the most
+# from moving to it, see migration, migrationCost is the cycles a moved job runs again,
+# a preempted job too, it is put back to the queue and starts again on any CPU
+# With backfilling the 8GB jobs on the 16GB CPUs are backfill, EASY style: with the
+# longest 8GB job on a 16GB CPU left to run, the k 16GB jobs waiting take the CPUs of
+# the first k 16GB jobs to complete, so the shadow time, when the last of them starts,
+# is the k-th earliest completion of the 16GB jobs, the 8GB job is left to run when it
+# is predicted to complete by the shadow time and preempted and requeued otherwise, or
+# when fewer than k 16GB jobs run, a new 16GB job still preempts a longer 16GB job
+# the completions of the 16GB jobs are in a heap, the k-th earliest is found in O(k log k)
 
 
 class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "startTime", "completedTime")
+
     def __init__(self, PID, CPUCycles, MemorySize, Arrival):
         self.PID = PID
         self.CPUCycles = CPUCycles
@@ -37,50 +62,195 @@ class Process:
         return "PID={}, Arrival={} CPUCycles={}/{}, Size={}, Started={}, Completed={}".format(self.PID, self.arrivalTime, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
 
 class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
     def __init__(self, process, timestamp, cpu):
         self.process = process
         self.timestamp = timestamp
         self.cpu = cpu
 
 class ProcessArrivalEvent:
+    __slots__ = ("process", "timestamp")
+
     def __init__(self, process, timestamp):
         self.process = process
         self.timestamp = timestamp
 
+def defaultTopology():
+    # 6 CPUs, the 8GB CPUs are slow and small, 2x slower, 2GHz vs 4GHz
+    return Topology([
+        CPUClass("8GB", 3, speedFactor=2, memory=8, names=["Pa", "Pb", "Pc"]),
+        CPUClass("16GB", 3, speedFactor=1, memory=16, names=["Pd", "Pe", "Pf"]),
+    ])
+
 class Simulation:
-    def __init__(self):
-        # 6 CPUs
-        self.CPUs_8GB = ["Pa", "Pb", "Pc"]  # slow and small CPUs
-        self.CPUs_16GB = ["Pd", "Pe", "Pf"]  # fast and large CPUs
-        self.slowCPUFactor = 2 # a multiple for time to spend on slower CPU, a slow CPU is 2x slower, 2GHz vs 4GHz
-        # need a round queue of CPUs
-        self.idle8GBCPUs = deque(self.CPUs_8GB, maxlen=len(self.CPUs_8GB))
-        self.idle16GBCPUs = deque(self.CPUs_16GB, maxlen=len(self.CPUs_16GB))
+    # cycles a job migrated to another CPU has to run again
+    migrationCost = 0
+    # reserve the 16GB CPUs for the 16GB jobs instead of preempting the 8GB jobs on them
+    backfilling = False
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
 
-        self.incoming8GBProcesses = []
-        self.incoming16GBProcesses = []
+        # incoming process queues, shortest job first
+        self.incoming8GBProcesses = ShortestJobQueue()
+        self.incoming16GBProcesses = ShortestJobQueue()
 
 
         self.contextSwitches = 0
         
 
-        # list of completed processes
-        self.completedProcess = []
-
-        # a queue of events
-        self.events = []
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
+
+        # a queue of events, ordered by time
+        self.events = EventQueue()
+        # done events of the running jobs, grouped by (CPU class, memory class)
+        self.running = RunningJobIndex()
+        # picks the running job an idle CPU takes over, made in run from migrationCost
+        self.migrator = None
+        # with backfilling, heap of (timestamp, sequence, done event) of the 16GB jobs
+        # started, entries of jobs no longer running are skipped
+        self.completions16GB = []
+        self.sequence = count()
+        # stream of processes still to arrive, only the next one is in the event queue
+        self.arrivals = None
         # simulation time
         self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology, the classes with the most
+        # memory are the 16GB CPUs, all the others are the 8GB CPUs
+        self.topology = topology
+        smallClasses, largeClasses = topology.memoryTiers()
+        self.CPUs_8GB = topology.cpus(smallClasses)
+        self.CPUs_16GB = topology.cpus(largeClasses)
+        # need a round queue of CPUs
+        self.idle8GBCPUs = deque(self.CPUs_8GB, maxlen=len(self.CPUs_8GB))
+        self.idle16GBCPUs = deque(self.CPUs_16GB, maxlen=len(self.CPUs_16GB))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
+        # "8GB" or "16GB" for each CPU
+        self.tier = ["8GB"] * len(topology)
+        for cpu in self.CPUs_16GB:
+            self.tier[cpu] = "16GB"
+        # jobs up to largeMemory run on the 16GB CPUs, the ones up to smallMemory on any CPU
+        self.largeMemory = largeClasses[0].memory
+        self.smallMemory = min(cpuClass.memory for cpuClass in smallClasses) if smallClasses else self.largeMemory
+        # the CPU class name of each CPU, and the running index groups of the jobs each CPU
+        # can take over, the 16GB jobs only on the 16GB CPUs
+        self.group = [cpuClass.name for cpuClass in topology.cpuClass]
+        self.stealGroups = [[(cpuClass.name, memoryClass) for cpuClass in topology.classes
+                             for memoryClass in (("8GB", "16GB") if self.tier[cpu] == "16GB" else ("8GB",))]
+                            for cpu in range(len(topology))]
+        # the class names of the 16GB CPUs and of the 8GB CPUs, for the preemption lookups
+        self.largeGroups = [cpuClass.name for cpuClass in largeClasses]
+        self.smallGroups = [cpuClass.name for cpuClass in smallClasses]
 
     def isDone(self):
         return len(self.events) == 0 and len(self.incoming8GBProcesses) == 0 and \
                 len(self.incoming16GBProcesses) == 0 and \
                 len(self.idle8GBCPUs) == len(self.CPUs_8GB) and  len(self.idle16GBCPUs) == len(self.CPUs_16GB)
 
+    def addArrivals(self, arrivals):
+        # arrivals are processes in arrival time order, e.g. a generator reading a trace
+        # they are put into the event queue one at a time as the previous one arrives
+        self.arrivals = iter(arrivals)
+        self.pushNextArrival()
+
+    def pushNextArrival(self):
+        process = next(self.arrivals, None)
+        if process is None:
+            return
+        if process.arrivalTime < self.currentTime:
+            raise ValueError("Process {} arrives at {}, before the simulation time {}".format(process.PID, process.arrivalTime, self.currentTime))
+        # before the completions at the same time, as with all the arrivals queued up front
+        self.events.pushFirst(ProcessArrivalEvent(process, process.arrivalTime))
+
+    def runningGroup(self, cpu, process):
+        # group of a running job in the running index, (CPU class, memory class)
+        memoryClass = "8GB" if process.MemorySize <= self.smallMemory else "16GB"
+        return (self.group[cpu], memoryClass)
+
+    def remainingCycles(self, event):
+        # projected cycles left for the job running until the event
+        process = event.process
+        return process.RemCPUCycles - (self.currentTime - process.startTime) // self.speed[event.cpu]
+
+    def trackCompletion(self, event):
+        # a job is started, with backfilling the completions of the 16GB jobs are kept
+        if not self.backfilling or event.process.MemorySize <= self.smallMemory:
+            return
+        heap = self.completions16GB
+        heapq.heappush(heap, (event.timestamp, next(self.sequence), event))
+        # drop the stale entries once they are the majority of the heap
+        if len(heap) > 2 * len(self.CPUs_16GB) + 16:
+            self.completions16GB = [entry for entry in heap if self.running.isRunning(entry[2])]
+            heapq.heapify(self.completions16GB)
+
+    def shadowTime(self, k):
+        # the k-th earliest completion of the running 16GB jobs, None when fewer than k
+        # run, the heap is walked from the top in time order
+        heap = self.completions16GB
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            if self.running.isRunning(entry[2]):
+                k -= 1
+                if k == 0:
+                    return entry[0]
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return None
+
+    def idle(self, cpu):
+        # the idle queue of the CPU's tier
+        return self.idle16GBCPUs if self.tier[cpu] == "16GB" else self.idle8GBCPUs
+
+    def canSteal(self, cpu):
+        # no job waiting that the CPU runs
+        if self.tier[cpu] == "16GB":
+            return len(self.incoming16GBProcesses) == 0
+        return len(self.incoming8GBProcesses) == 0
+
+    def steal(self, cpu, profiling):
+        # the idle CPU takes over the running job that gains the most from moving to it
+        # returns the CPU the job left, idle now, or None
+        if profiling:
+            self.profile.count("eventsScanned", len(self.stealGroups[cpu]))
+        ev = self.migrator.best(self.running, self.stealGroups[cpu], cpu, self.currentTime)
+        if ev is None:
+            return None
+        process = self.migrator.take(self.running, self.events, ev, self.currentTime)
+        # get the idle CPU, the last one put back to its queue
+        self.idle(cpu).pop()
+        # return the CPU the job leaves
+        self.idle(ev.cpu).append(ev.cpu)
+        # assign the process to the idle CPU
+        if self.trace.events:
+            self.trace.start(self.currentTime, process, self.topology.names[cpu])
+        completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
+        handle = self.events.push(completedEvent)
+        self.running.add(completedEvent, self.runningGroup(cpu, process), handle)
+        self.trackCompletion(completedEvent)
+        self.contextSwitches += 1
+        if profiling:
+            self.profile.count("migrations")
+            self.profile.count("dispatches")
+        return ev.cpu
+
     def run(self):
-        # sort incoming processes by time, shortest jobs first
-        self.incoming8GBProcesses.sort(key=lambda p: (p.RemCPUCycles, p.PID))
-        self.incoming16GBProcesses.sort(key=lambda p: (p.RemCPUCycles, p.PID))
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        self.migrator = Migrator(self.speed, self.migrationCost)
         while not self.isDone():
             # check if 16GB jobs is ready and 16GB CPU is availaable
             if len(self.incoming16GBProcesses) > 0 and len(self.idle16GBCPUs) > 0:
@@ -88,14 +258,22 @@ class Simulation:
                 # get the CPU
                 cpu = self.idle16GBCPUs.popleft()
                 # get that shortest remaining process
-                process = self.incoming16GBProcesses.pop(0)
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incoming16GBProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
                 # set the time when the process is complete
                 process.startTime = self.currentTime
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
                 # setup an event to get the job off the CPU
-                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles, cpu)
+                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                handle = self.events.push(completedEvent)
+                self.running.add(completedEvent, self.runningGroup(cpu, process), handle)
+                self.trackCompletion(completedEvent)
                 self.contextSwitches += 1
             # assign 8GB jobs, can assing if 8GB CPU is availabe or 16GB CPU is available
             elif len(self.incoming8GBProcesses) > 0 and (len(self.idle16GBCPUs) > 0 or len(self.idle8GBCPUs) > 0):
@@ -105,188 +283,236 @@ class Simulation:
                     # but only if there are no more jobs than fast CPUs available, or slow slow CPUs avail
                     # if the fast CPU is available at this point, this means no more 16GB jobs
                     cpu = self.idle16GBCPUs.popleft()
-                    cpuTimeMultiplier = 1
+                    cpuTimeMultiplier = self.speed[cpu]
                 else:
                     cpu = self.idle8GBCPUs.popleft()
-                    cpuTimeMultiplier = self.slowCPUFactor
+                    cpuTimeMultiplier = self.speed[cpu]
                 # get the shortest remaining process
-                process = self.incoming8GBProcesses.pop(0)
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incoming8GBProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
                 # set the time when the process is complete
                 process.startTime = self.currentTime
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
                 # setup the event when the job is done
                 completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * cpuTimeMultiplier, cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                handle = self.events.push(completedEvent)
+                self.running.add(completedEvent, self.runningGroup(cpu, process), handle)
+                self.trackCompletion(completedEvent)
                 self.contextSwitches += 1
             else:
                 # no more idle CPUs or processes
                 # check the the even when the next process is complete
-                # find the event with the smallest time
-                minTimeEventIndex = 0
-                for i, ev in enumerate(self.events):
-                    if ev.timestamp < self.events[minTimeEventIndex].timestamp:
-                        minTimeEventIndex = i
-                minTimeEvent = self.events[minTimeEventIndex]
-                # remove the event from queue
-                self.events.pop(minTimeEventIndex)
+                # take the event with the smallest time off the queue
+                if profiling:
+                    phaseStart = perf_counter()
+                minTimeEvent = self.events.pop()
+                if profiling:
+                    self.profile.add("eventSelection", phaseStart)
+                    self.profile.count("eventsScanned")
                 # advance our simulation time to the event
                 self.currentTime = minTimeEvent.timestamp
                 process = minTimeEvent.process
                 # check the event type
                 if type(minTimeEvent) == ProcessArrivalEvent:
+                    if profiling:
+                        self.profile.count("arrivals")
+                    # the next process from the stream is due
+                    if self.arrivals is not None:
+                        self.pushNextArrival()
                     # place the process into the appropriate ready/incoming queue
                     # reevaluate if there is anything that is possible to bump off the CPU
-                    if process.MemorySize <= 8:
+                    if process.MemorySize <= self.smallMemory:
                         self.incoming8GBProcesses.append(process)
                         # check if there is any 8G job on 16GB or 8GB CPU that has longer time to run
                         # only if there are no CPUs available, if they are available the job will be place there in the next round
                     
                         if len(self.idle16GBCPUs) == 0 and len(self.idle8GBCPUs) == 0:
-                            # sort the events by the time, from earlier to later,
-                            # latest process to be completed, preferably on 16GB
-                            self.events.sort(key=lambda e: (e.timestamp, type(e) == ProcessDoneEvent and e.cpu in self.CPUs_16GB))
-                            eventIndexToReplace = None
-                            for i, ev in enumerate(self.events):
-                                if type(ev) == ProcessDoneEvent:
-                                    processToReplace = ev.process
-                                    # check if there is a process with more CPU cycles left, or 8GB process. so the new job completes faster
-                                    RemCycles = processToReplace.RemCPUCycles - (self.currentTime - processToReplace.startTime)
-                                    if ev.cpu in self.CPUs_8GB:
-                                        RemCycles = processToReplace.RemCPUCycles - (self.currentTime - processToReplace.startTime) // self.slowCPUFactor
-                                    else:
-                                        RemCycles = processToReplace.RemCPUCycles - (self.currentTime - processToReplace.startTime)
-                                    if processToReplace.MemorySize <= 8 and RemCycles > process.RemCPUCycles:
-                                       
-                                        eventIndexToReplace = i
-                            if eventIndexToReplace is not None:
-                                # remove the event from the queue
-                                ev = self.events.pop(eventIndexToReplace)
+                            if profiling:
+                                phaseStart = perf_counter()
+                            # the longest remaining 8GB job on each CPU class, preferably on 16GB
+                            eventToReplace = None
+                            RemCycles = process.RemCPUCycles
+                            for cpuClass in self.largeGroups + self.smallGroups:
+                                ev = self.running.longest((cpuClass, "8GB"))
+                                if profiling and ev is not None:
+                                    self.profile.count("eventsScanned")
+                                # check if there is a process with more CPU cycles left, so the new job completes faster
+                                if ev is not None and self.remainingCycles(ev) > RemCycles:
+                                    eventToReplace = ev
+                                    RemCycles = self.remainingCycles(ev)
+                            if eventToReplace is not None:
+                                ev = eventToReplace
+                                # remove the event from the queue, the handle is only marked as cancelled
+                                self.events.cancel(self.running.remove(ev))
                                 # get the process to replace
                                 processToReplace = ev.process
                                 cpu = ev.cpu
                                 # preempt the process
                                 
                                 
-                                if cpu in self.CPUs_16GB:
+                                if self.tier[cpu] == "16GB":
                                     self.idle16GBCPUs.append(ev.cpu)
-                                    processToReplace.RemCPUCycles -= self.currentTime - processToReplace.startTime
                                 else:
                                     self.idle8GBCPUs.append(ev.cpu)
-                                    processToReplace.RemCPUCycles -= (self.currentTime - processToReplace.startTime) // self.slowCPUFactor
+                                processToReplace.RemCPUCycles -= (self.currentTime - processToReplace.startTime) // self.speed[cpu] - self.migrationCost
                                 self.incoming8GBProcesses.append(processToReplace)
-                    elif MemorySize <= 16:
+                                if profiling:
+                                    self.profile.count("preemptions")
+                            if profiling:
+                                self.profile.add("preemption", phaseStart)
+                    elif process.MemorySize <= self.largeMemory:
                         self.incoming16GBProcesses.append(process)
                         # check if there anything on the 16GB CPU that is either 8GB in size or has more burst time to complete
-                        # sort the events, the best to replace is the latest 8GB completion on 16GB CPU
-                        self.events.sort(key=lambda e: (type(e) == ProcessDoneEvent and e.cpu in self.CPUs_16GB, e.process.MemorySize <= 8, e.timestamp))
+                        # the best to replace is the latest 8GB completion on 16GB CPU
                         if len(self.idle16GBCPUs) == 0:
-                            eventIndexToReplace = None
-                            for i, ev in enumerate(self.events):
-                                if type(ev) == ProcessDoneEvent and ev.cpu in self.CPUs_16GB:
-                                    processToReplace = ev.process
-                                    # check if there is a process with more CPU cycles left, or 8GB process. so the new job completes faster
-                                    if processToReplace.MemorySize <= 8:
-                                        # a smaller job taking better CPU, the prime candidate for replacement
-                                        eventIndexToReplace = i
-                                    elif processToReplace.RemCPUCycles - (self.currentTime - processToReplace.startTime) > process.RemCPUCycles:
-                                        eventIndexToReplace = i
-                            if eventIndexToReplace is not None:
-                                # remove the event from the queue
-                                ev = self.events.pop(eventIndexToReplace)
+                            if profiling:
+                                phaseStart = perf_counter()
+                            # a smaller job taking better CPU, the prime candidate for replacement
+                            eventToReplace = None
+                            for cpuClass in self.largeGroups:
+                                ev = self.running.longest((cpuClass, "8GB"))
+                                if profiling and ev is not None:
+                                    self.profile.count("eventsScanned")
+                                if ev is not None and (eventToReplace is None or ev.timestamp > eventToReplace.timestamp):
+                                    eventToReplace = ev
+                            if self.backfilling and eventToReplace is not None:
+                                # the 8GB job completes by the time the waiting 16GB jobs start
+                                # on the CPUs of the 16GB jobs
+                                waiting = len(self.incoming16GBProcesses)
+                                if profiling:
+                                    self.profile.count("eventsScanned", waiting)
+                                shadow = self.shadowTime(waiting)
+                                if shadow is not None and eventToReplace.timestamp <= shadow:
+                                    eventToReplace = None
+                                    if profiling:
+                                        self.profile.count("reservations")
+                            if eventToReplace is None:
+                                # otherwise the 16GB job with more CPU cycles left, so the new job completes faster
+                                RemCycles = process.RemCPUCycles
+                                for cpuClass in self.largeGroups:
+                                    ev = self.running.longest((cpuClass, "16GB"))
+                                    if profiling and ev is not None:
+                                        self.profile.count("eventsScanned")
+                                    if ev is not None and self.remainingCycles(ev) > RemCycles:
+                                        eventToReplace = ev
+                                        RemCycles = self.remainingCycles(ev)
+                            if eventToReplace is not None:
+                                ev = eventToReplace
+                                # remove the event from the queue, the handle is only marked as cancelled
+                                self.events.cancel(self.running.remove(ev))
                                 # get the process to replace
                                 processToReplace = ev.process
                                 # preempt the process
-                                processToReplace.RemCPUCycles -= self.currentTime - processToReplace.startTime
-                                self.incoming16GBProcesses.append(processToReplace)
+                                processToReplace.RemCPUCycles -= (self.currentTime - processToReplace.startTime) // self.speed[ev.cpu] - self.migrationCost
+                                # put it back to the queue of its own memory class
+                                if processToReplace.MemorySize <= self.smallMemory:
+                                    self.incoming8GBProcesses.append(processToReplace)
+                                else:
+                                    self.incoming16GBProcesses.append(processToReplace)
                                 self.idle16GBCPUs.append(ev.cpu)
+                                if profiling:
+                                    self.profile.count("preemptions")
+                            if profiling:
+                                self.profile.add("preemption", phaseStart)
 
 
                 else:
                     # process done event
                     cpu = minTimeEvent.cpu
+                    self.running.remove(minTimeEvent)
 
                     # put the process to completed
                     process.RemCPUCycles = 0
                     # completed at this time of the simulation
                     process.completedTime = self.currentTime 
-                    self.completedProcess.append(process)
-                    print("Simo time {}: Process {} completes on CPU {}".format(self.currentTime, process, cpu))
+                    self.completed.add(process)
+                    if profiling:
+                        self.profile.count("completions")
+                    if self.trace.events:
+                        self.trace.complete(self.currentTime, process, self.topology.names[cpu])
                     # put the CPU back to appropriate idle
-                    if cpu in self.CPUs_8GB:
-                        self.idle8GBCPUs.append(cpu)
-                    else:
-                        self.idle16GBCPUs.append(cpu)
-                        # fast CPU is available, see if there is anything on slow CPU to switch
-                        # check if it possible to switch a context of a process from slower CPU
-                        if len(self.incoming16GBProcesses) == 0 and len(self.idle8GBCPUs) < len(self.CPUs_8GB):
-                            # something is running on the slow CPU, lets find it
-                            slowCPUEventIndex = None
-                            for i, ev in enumerate(self.events):
-                                # if the event occurs after the current time, meaning the process is still running
-                                if ev.timestamp > self.currentTime and ev.cpu in self.CPUs_8GB:
-                                    # found this event at index i
-                                    slowCPUEventIndex = i
-                            # if found the latest possible event to offload
-                            if slowCPUEventIndex is not None:
-                                slowCPUEvent = self.events.pop(slowCPUEventIndex)
-                                process = slowCPUEvent.process
-                                cpu = slowCPUEvent.cpu
-                                # calculate how many cycles are left
-                                process.RemCPUCycles -= (self.currentTime - process.startTime) // self.slowCPUFactor
-                                # return the slow CPU
-                                self.idle8GBCPUs.append(cpu)
-                                # get the fast CPU
-                                cpu = self.idle16GBCPUs.popleft()
-                                # assign the process to the fast CPU
-                                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
-                                # time is * by burstTimeMultiplier, to set the process for x2 time on slower CPU
-                                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles, cpu)
-                                self.events.append(completedEvent)
-                                self.contextSwitches += 1
+                    self.idle(cpu).append(cpu)
+                    # CPU is available, see if there is anything on a slower CPU to switch
+                    # the CPU the job leaves does the same while it has nothing to run
+                    if self.canSteal(cpu):
+                        if profiling:
+                            phaseStart = perf_counter()
+                        while cpu is not None and self.canSteal(cpu):
+                            cpu = self.steal(cpu, profiling)
+                        if profiling:
+                            self.profile.add("migration", phaseStart)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
 
 
 
 
 
 
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
+
     def printStats(self):
+        stats = self.stats()
         print("Statistics:")
-        nProcesses = len(self.completedProcess)
-        totalWaitTime = 0
-        totalTurnAroundTime = 0
-        for process in self.completedProcess:
-            turnAroundTime = process.completedTime - process.arrivalTime
-            totalTurnAroundTime += turnAroundTime
-            waitTime = turnAroundTime - process.CPUCycles
-            totalWaitTime += waitTime
         # print the averages
-        print("Average wait time (seconds at 4GHz): {}".format(totalWaitTime / nProcesses / 4E9))
-        print("Average turnaround time (seconds at 4GHz): {}".format(totalTurnAroundTime / nProcesses / 4E9))
-        print("Context switches: {}".format(self.contextSwitches))
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
 
 
 
 
+def queueProcesses(simo, processes):
+    # Process-like objects, e.g. the rows of a ProcessTable, in arrival time order
+    def arrivals():
+        for process in processes:
+            # the process is placed into the event queue for arrival
+            if process.MemorySize <= simo.largeMemory:
+                yield process
+            else:
+                print("Rejecting Process {} with memory size {} exceeding {} GB".format(process.PID, process.MemorySize, simo.largeMemory))
+    simo.addArrivals(arrivals())
+
+
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation, rows must be in arrival time order
+    # the processes are created as the simulation gets to them
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize, Arrival) for PID, CPUCycles, MemorySize, Arrival in rows))
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--migration-cost", type=int, default=Simulation.migrationCost, help="cycles a job migrated to another CPU runs again")
+    parser.add_argument("--backfill", action="store_true", help="reserve the 16GB CPUs for the 16GB jobs, EASY backfilling")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
     # create a simulation instance
-    simo = Simulation()
-    with open('processes8_16_arrival.csv') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        csvit = iter(csv_reader)
-        csvHeader = next(csvit)
-        for PID, CPUCycles, MemorySize, Arrival in csvit:
-            PID = int(PID)
-            CPUCycles = int(CPUCycles)
-            MemorySize = int(MemorySize)
-            Arrival = int(Arrival)
-            # create a process, place into the even queue for arrival
-            if MemorySize <= 16:
-                simo.events.append(ProcessArrivalEvent(Process(PID, CPUCycles, MemorySize, Arrival), Arrival))
-            else:
-                print("Rejecting Process {} with memory size {} exceeding 16 GB".format(PID, MemorySize))
-    # processes are read, ready to run
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    simo.migrationCost = args.migration_cost
+    simo.backfilling = args.backfill
+    # read the processes in arrival order, as the simulation gets to them
+    addProcesses(simo, streamArrivals(workloadPath))
     simo.run()
     simo.printStats()
     
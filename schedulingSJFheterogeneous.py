@@ -1,8 +1,18 @@
 from asyncio import events
-import csv
+import argparse
 import random
 from random import randint
 from collections import deque
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from workload import readWorkload
+from readyqueue import ShortestJobQueue
+from runningindex import RunningJobIndex
+from migration import Migrator
 
 
 # Heterogeneous CPU scheduling
@@ -10,11 +20,15 @@ from collections import deque
 # if there are more jobs than fast CPUs, assign to the slow CPU, the first shorter jobs.
 # otherwise, assign to the fast CPU.
 # Overall slow CPUs get shorther jobs first, then fast CPUs get larger jobs after that
-# if a fast CPU becomes available and no more jobs are incoming
-# switch the job from a slow CPU context to the faster CPU.
+# if a CPU becomes available and no more jobs are incoming
+# switch the job that gains the most from a slower CPU context to it, see migration,
+# the CPU it leaves does the same, migrationCost is the cycles a moved job runs again
 
 
 class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "startTime", "completedTime")
+
     def __init__(self, PID, CPUCycles, MemorySize):
         self.PID = PID
         self.CPUCycles = CPUCycles
@@ -31,41 +45,108 @@ class Process:
         return "PID={}, CPUCycles={}/{}, Size={}, Started={}, Completed={}".format(self.PID, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
 
 class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
     def __init__(self, process, timestamp, cpu):
         self.process = process
         self.timestamp = timestamp
         self.cpu = cpu
 
+def defaultTopology():
+    # 6 CPUs, a slow CPU is 2x slower, 2GHz vs 4GHz
+    return Topology([
+        CPUClass("slow", 3, speedFactor=2, names=["Pa", "Pb", "Pc"]),
+        CPUClass("fast", 3, speedFactor=1, names=["Pd", "Pe", "Pf"]),
+    ])
+
 class Simulation:
-    def __init__(self):
-        # 6 CPUs
-        self.slowCPUs = ["Pa", "Pb", "Pc"]
-        self.fastCPUs = ["Pd", "Pe", "Pf"]
-        # need a round queue of CPUs
-        self.idleSlowCPUs = deque(self.slowCPUs, maxlen=len(self.slowCPUs))
-        self.idleFastCPUs = deque(self.fastCPUs, maxlen=len(self.fastCPUs))
-        # a multiple for time to spend on slower CPU, a slow CPU is 2x slower, 2GHz vs 4GHz
-        self.slowCPUFactor = 2 
-        # incoming process queue, to be assigned to CPUs
-        self.incomingProcesses = []
+    # cycles a job migrated to another CPU has to run again
+    migrationCost = 0
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
+        # incoming process queue, to be assigned to CPUs, shortest job first
+        self.incomingProcesses = ShortestJobQueue()
 
         self.contextSwitches = 0
         
 
-        # list of completed processes
-        self.completedProcess = []
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
 
-        # a queue of events
-        self.events = []
+        # a queue of events, ordered by time
+        self.events = EventQueue()
+        # done events of the running jobs, grouped by CPU class
+        self.running = RunningJobIndex()
+        # picks the running job an idle CPU takes over, made in run from migrationCost
+        self.migrator = None
         # simulation time
         self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology, the classes with the
+        # smallest speed factor are the fast CPUs, all the others are slow
+        self.topology = topology
+        slowClasses, fastClasses = topology.speedTiers()
+        self.slowCPUs = topology.cpus(slowClasses)
+        self.fastCPUs = topology.cpus(fastClasses)
+        # need a round queue of CPUs
+        self.idleSlowCPUs = deque(self.slowCPUs, maxlen=len(self.slowCPUs))
+        self.idleFastCPUs = deque(self.fastCPUs, maxlen=len(self.fastCPUs))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
+        # "slow" or "fast" for each CPU
+        self.tier = ["slow"] * len(topology)
+        for cpu in self.fastCPUs:
+            self.tier[cpu] = "fast"
+        # the running index group of each CPU, its class name, and all the groups
+        self.group = [cpuClass.name for cpuClass in topology.cpuClass]
+        self.groups = [cpuClass.name for cpuClass in topology.classes]
 
     def isDone(self):
         return len(self.incomingProcesses) == 0 and len(self.idleSlowCPUs) == len(self.slowCPUs) and  len(self.idleFastCPUs) == len(self.fastCPUs)
 
+    def idle(self, cpu):
+        # the idle queue of the CPU's tier
+        return self.idleFastCPUs if self.tier[cpu] == "fast" else self.idleSlowCPUs
+
+    def steal(self, cpu, profiling):
+        # the idle CPU takes over the running job that gains the most from moving to it
+        # returns the CPU the job left, idle now, or None
+        if profiling:
+            self.profile.count("eventsScanned", len(self.groups))
+        ev = self.migrator.best(self.running, self.groups, cpu, self.currentTime)
+        if ev is None:
+            return None
+        process = self.migrator.take(self.running, self.events, ev, self.currentTime)
+        # get the idle CPU, the last one put back to its queue, before the CPU the job
+        # leaves is put back, it can be in the same queue
+        self.idle(cpu).pop()
+        # return the CPU the job leaves
+        self.idle(ev.cpu).append(ev.cpu)
+        # assign the process to the idle CPU
+        if self.trace.events:
+            self.trace.start(self.currentTime, process, self.topology.names[cpu])
+        completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
+        handle = self.events.push(completedEvent)
+        self.running.add(completedEvent, self.group[cpu], handle)
+        self.contextSwitches += 1
+        if profiling:
+            self.profile.count("migrations")
+            self.profile.count("dispatches")
+        return ev.cpu
+
     def run(self):
-        # sort incoming processes by time, shortest jobs first
-        self.incomingProcesses.sort(key=lambda p: (p.CPUCycles, p.PID))
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        self.migrator = Migrator(self.speed, self.migrationCost)
         while not self.isDone():
             # check if there is any CPU idle and a process incoming
             # check if there are more jobs than fast CPUs, and put shorter jobs to slower CPUs first
@@ -73,123 +154,139 @@ class Simulation:
                 # try to load the fast CPU
                 # get the CPU
                 cpu = self.idleSlowCPUs.popleft()
-                burstTimeMultiplier = self.slowCPUFactor  # 2 GHz
+                burstTimeMultiplier = self.speed[cpu]  # 2 GHz
                 # get that shortest remaining process
-                process = self.incomingProcesses.pop(0)
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incomingProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
                 # set the time when the process is complete
                 process.startTime = self.currentTime
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
                 # time is * by burstTimeMultiplier, to set the process for x2 time on slower CPU
                 completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * burstTimeMultiplier, cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                handle = self.events.push(completedEvent)
+                self.running.add(completedEvent, self.group[cpu], handle)
                 self.contextSwitches += 1
             # after all slow CPUs are busy with short jobs, put longer jobs to faster CPUs
             elif len(self.incomingProcesses) > 0 and len(self.idleFastCPUs) > 0:
                 # try to load the fast CPU
                 # get the CPU
-                burstTimeMultiplier = 1  # 4 GHz
                 cpu = self.idleFastCPUs.popleft()
+                burstTimeMultiplier = self.speed[cpu]  # 4 GHz
                 # get that shortest remaining process
-                process = self.incomingProcesses.pop(0)
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incomingProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
                 # set the time when the process is complete
                 process.startTime = self.currentTime
-                print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
                 # time is * by burstTimeMultiplier, to set the process for x2 time on slower CPU
                 completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * burstTimeMultiplier, cpu)
                 # put an event to the queue
-                self.events.append(completedEvent)
+                handle = self.events.push(completedEvent)
+                self.running.add(completedEvent, self.group[cpu], handle)
                 self.contextSwitches += 1
             else:
                 # no more idle CPUs or processes
                 # check the the even when the next process is complete
-                # find the event with the smallest time
-                minTimeEventIndex = 0
-                for i, ev in enumerate(self.events):
-                    if ev.timestamp < self.events[minTimeEventIndex].timestamp:
-                        minTimeEventIndex = i
-                minTimeEvent = self.events[minTimeEventIndex]
-                # remove the event from queue
-                self.events.pop(minTimeEventIndex)
+                # take the event with the smallest time off the queue
+                if profiling:
+                    phaseStart = perf_counter()
+                minTimeEvent = self.events.pop()
+                if profiling:
+                    self.profile.add("eventSelection", phaseStart)
+                    self.profile.count("eventsScanned")
                 # advance our simulation time to the event
                 self.currentTime = minTimeEvent.timestamp
                 process = minTimeEvent.process
                 cpu = minTimeEvent.cpu
+                self.running.remove(minTimeEvent)
 
                 # put the process to completed
                 process.RemCPUCycles = 0
                 # completed at this time of the simulation
                 process.completedTime = self.currentTime 
-                self.completedProcess.append(process)
-                print("Simo time {}: Process {} completes on CPU {}".format(self.currentTime, process, cpu))
+                self.completed.add(process)
+                if profiling:
+                    self.profile.count("completions")
+                if self.trace.events:
+                    self.trace.complete(self.currentTime, process, self.topology.names[cpu])
                 # put the CPU back to appropriate idle
-                if cpu in self.fastCPUs:
-                    self.idleFastCPUs.append(cpu)
-                    # fast CPU became available
-                    # check if it possible to switch a context of a process from slower CPU
-                    if len(self.incomingProcesses) == 0 and len(self.idleSlowCPUs) < len(self.slowCPUs):
-                        slowCPUEventIndex = None
-                        for i, ev in enumerate(self.events):
-                            # if the event occurs after the current time, meaning the process is still running
-                            if ev.timestamp > self.currentTime and ev.cpu in self.slowCPUs:
-                                # found this event at index i
-                                slowCPUEventIndex = i
-                        # if found the latest possible event to offload
-                        if slowCPUEventIndex is not None:
-                            slowCPUEvent = self.events.pop(slowCPUEventIndex)
-                            process = slowCPUEvent.process
-                            cpu = slowCPUEvent.cpu
-                            # calculate how many cycles are left
-                            process.RemCPUCycles -= (self.currentTime - process.startTime) // self.slowCPUFactor
-                            # return the slow CPU
-                            self.idleSlowCPUs.append(cpu)
-                            # get the fast CPU
-                            cpu = self.idleFastCPUs.popleft()
-                            # assign the process to the fast CPU
-                            print("Simo time {}: Process {} starts on CPU {}".format(self.currentTime, process, cpu))
-                            # time is * by burstTimeMultiplier, to set the process for x2 time on slower CPU
-                            completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles, cpu)
-                            self.events.append(completedEvent)
-                            self.contextSwitches += 1
-                else:
-                    self.idleSlowCPUs.append(cpu)
+                self.idle(cpu).append(cpu)
+                # CPU became available and no more jobs are incoming
+                # check if it possible to switch a context of a process from a slower CPU
+                if len(self.incomingProcesses) == 0:
+                    if profiling:
+                        phaseStart = perf_counter()
+                    while cpu is not None:
+                        cpu = self.steal(cpu, profiling)
+                    if profiling:
+                        self.profile.add("migration", phaseStart)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
 
 
 
 
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
 
     def printStats(self):
+        stats = self.stats()
         print("Statistics:")
-        nProcesses = len(self.completedProcess)
-        totalWaitTime = 0
-        totalTurnAroundTime = 0
-        for process in self.completedProcess:
-            turnAroundTime = process.completedTime - process.arrivalTime
-            totalTurnAroundTime += turnAroundTime
-            waitTime = turnAroundTime - process.CPUCycles
-            totalWaitTime += waitTime
         # print the averages
-        print("Average wait time (seconds at 4GHz): {}".format(totalWaitTime / nProcesses / 4E9))
-        print("Average turnaround time (seconds at 4GHz): {}".format(totalTurnAroundTime / nProcesses / 4E9))
-        print("Context switches: {}".format(self.contextSwitches))
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
+
+
+
 
+def queueProcesses(simo, processes):
+    # place Process-like objects, e.g. the rows of a ProcessTable, in the queue
+    for process in processes:
+        simo.incomingProcesses.append(process)
 
 
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation
+    # create a process for each row, place in the queue
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize) for PID, CPUCycles, MemorySize, Arrival in rows))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--migration-cost", type=int, default=Simulation.migrationCost, help="cycles a job migrated to another CPU runs again")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
     # create a simulation instance
-    simo = Simulation()
-    with open('processes8_16_arrival.csv') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        csvit = iter(csv_reader)
-        csvHeader = next(csvit)
-        for PID, CPUCycles, MemorySize, Arrival in csvit:
-            PID = int(PID)
-            CPUCycles = int(CPUCycles)
-            MemorySize = int(MemorySize)
-            # create a process, place in the queue
-            simo.incomingProcesses.append(Process(PID, CPUCycles, MemorySize))
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    simo.migrationCost = args.migration_cost
+    addProcesses(simo, readWorkload(workloadPath))
     # processes are read, ready to run
     simo.run()
     simo.printStats()
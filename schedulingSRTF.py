@@ -0,0 +1,294 @@
+import argparse
+from collections import deque
+from eventqueue import EventQueue
+from simtrace import Tracer
+from simprofile import Profiler
+from simstats import CompletionStats, printLatency
+from topology import CPUClass, Topology
+from time import perf_counter
+from predictors import makePredictor
+from workload import streamArrivals
+from readyqueue import PredictedJobQueue, ShortestJobQueue
+from runningindex import RunningJobIndex
+
+
+# Shortest remaining time first with the arrival times of the workload
+# the processes arrive as events, a process that arrives when all the CPUs are busy
+# takes the CPU of the running job with the longest remaining time if its own time
+# is shorter, the preempted job goes back to the ready queue with the cycles it has left
+# the ready queue is a heap on the remaining cycles, the running jobs are in a
+# RunningJobIndex grouped by CPU class, on CPUs of the same speed the longest remaining
+# job of a class is the one that completes last, so a preemption looks at one job
+# per CPU class and not at every running job
+# with a predictor, see predictors, the queue, the running index and the preemptions
+# go by the predicted remaining cycles instead of the true ones
+
+
+class Process:
+    # fixed attributes, no per-instance dict
+    __slots__ = ("PID", "CPUCycles", "MemorySize", "RemCPUCycles", "arrivalTime", "startTime", "completedTime")
+
+    def __init__(self, PID, CPUCycles, MemorySize, Arrival):
+        self.PID = PID
+        self.CPUCycles = CPUCycles
+        self.MemorySize = MemorySize
+        self.RemCPUCycles = CPUCycles
+
+        # statistics for each process
+        self.arrivalTime = Arrival
+        self.startTime = None
+        self.completedTime = None
+
+    def __str__(self):
+        # returns a string for the process to be printed
+        return "PID={}, Arrival={} CPUCycles={}/{}, Size={}, Started={}, Completed={}".format(self.PID, self.arrivalTime, self.RemCPUCycles, self.CPUCycles, self.MemorySize, self.startTime, self.completedTime)
+
+class ProcessDoneEvent:
+    __slots__ = ("process", "timestamp", "cpu")
+
+    def __init__(self, process, timestamp, cpu):
+        self.process = process
+        self.timestamp = timestamp
+        self.cpu = cpu
+
+class ProcessArrivalEvent:
+    __slots__ = ("process", "timestamp")
+
+    def __init__(self, process, timestamp):
+        self.process = process
+        self.timestamp = timestamp
+
+def defaultTopology():
+    # 6 CPUs
+    return Topology([CPUClass("CPUs", 6, names=["Pa", "Pb", "Pc", "Pd", "Pe", "Pf"])])
+
+class Simulation:
+    # the job lengths the scheduling goes by, see predictors, oracle for the true ones
+    predictor = "oracle"
+    predictionAlpha = 0.5
+    def __init__(self, trace=None, profile=None, topology=None):
+        self.setTopology(topology if topology is not None else defaultTopology())
+        # incoming process queue, shortest remaining time first
+        self.incomingProcesses = ShortestJobQueue()
+
+        self.contextSwitches = 0
+        # the predictor of the run, None for the true lengths
+        self.lengthPredictor = None
+
+        # statistics of the completed processes, the processes themselves are not kept
+        self.completed = CompletionStats()
+
+        # a queue of events, ordered by time
+        self.events = EventQueue()
+        # done events of the running jobs, grouped by CPU class
+        self.running = RunningJobIndex()
+        # stream of processes still to arrive, only the next one is in the event queue
+        self.arrivals = None
+        # simulation time
+        self.currentTime = 0
+        # trace output, by default every event is printed
+        self.trace = trace if trace is not None else Tracer()
+        # run loop profiling, off by default
+        self.profile = profile if profile is not None else Profiler(enabled=False)
+
+    def setTopology(self, topology):
+        # the CPUs are the integer ids of the topology, all in one pool
+        self.topology = topology
+        self.CPUs = list(range(len(topology)))
+        # need a round queue of CPUs
+        self.idleCPUs = deque(self.CPUs, maxlen=len(self.CPUs))
+        # time multiple of a job on each CPU
+        self.speed = topology.speed
+        # the running index group of each CPU, its class name
+        self.group = [cpuClass.name for cpuClass in topology.cpuClass]
+        # jobs up to the memory of the smallest CPU class run anywhere
+        self.memory = min(cpuClass.memory for cpuClass in topology.classes)
+
+    def isDone(self):
+        return len(self.events) == 0 and len(self.incomingProcesses) == 0 and len(self.idleCPUs) == len(self.CPUs)
+
+    def addArrivals(self, arrivals):
+        # arrivals are processes in arrival time order, e.g. a generator reading a trace
+        # they are put into the event queue one at a time as the previous one arrives
+        self.arrivals = iter(arrivals)
+        self.pushNextArrival()
+
+    def pushNextArrival(self):
+        process = next(self.arrivals, None)
+        if process is None:
+            return
+        if process.arrivalTime < self.currentTime:
+            raise ValueError("Process {} arrives at {}, before the simulation time {}".format(process.PID, process.arrivalTime, self.currentTime))
+        # before the completions at the same time, as with all the arrivals queued up front
+        self.events.pushFirst(ProcessArrivalEvent(process, process.arrivalTime))
+
+    def expectedCycles(self, process):
+        # the cycles the scheduling expects a process that is not running to have left
+        if self.lengthPredictor is None:
+            return process.RemCPUCycles
+        return self.lengthPredictor.remaining(process)
+
+    def remainingCycles(self, event):
+        # projected cycles left for the job running until the event
+        process = event.process
+        return max(self.expectedCycles(process) - (self.currentTime - process.startTime) // self.speed[event.cpu], 0)
+
+    def run(self):
+        # the 8GB class of the statistics goes up to the memory of the small CPUs
+        self.completed.smallMemory = self.topology.smallMemory()
+        # profiling is read once, the phases only test this local
+        profiling = self.profile.enabled
+        if profiling:
+            runStart = perf_counter()
+        if self.predictor != "oracle":
+            # order the queue on the predicted lengths at the time a job is taken out
+            self.lengthPredictor = makePredictor(self.predictor, self.predictionAlpha, self.topology.smallMemory())
+            self.incomingProcesses = PredictedJobQueue(self.incomingProcesses, self.lengthPredictor)
+        while not self.isDone():
+            # check if there is any CPU idle and a process incoming
+            if len(self.incomingProcesses) > 0 and len(self.idleCPUs) > 0:
+                # get the CPU, first in the queue
+                cpu = self.idleCPUs.popleft()
+                # get the process with the shortest remaining time
+                if profiling:
+                    phaseStart = perf_counter()
+                process = self.incomingProcesses.pop()
+                if profiling:
+                    self.profile.add("readySelection", phaseStart)
+                    self.profile.count("dispatches")
+                # set the time when the process is started, the remaining cycles are counted from it
+                process.startTime = self.currentTime
+                if self.trace.events:
+                    self.trace.start(self.currentTime, process, self.topology.names[cpu])
+                completedEvent = ProcessDoneEvent(process, self.currentTime + process.RemCPUCycles * self.speed[cpu], cpu)
+                # put an event to the queue
+                handle = self.events.push(completedEvent)
+                if self.lengthPredictor is None:
+                    self.running.add(completedEvent, self.group[cpu], handle)
+                else:
+                    # the running index goes by the predicted completion
+                    self.running.add(completedEvent, self.group[cpu], handle, self.currentTime + self.lengthPredictor.remaining(process) * self.speed[cpu])
+                self.contextSwitches += 1
+            else:
+                # no more idle CPUs or processes
+                # take the event with the smallest time off the queue
+                if profiling:
+                    phaseStart = perf_counter()
+                minTimeEvent = self.events.pop()
+                if profiling:
+                    self.profile.add("eventSelection", phaseStart)
+                    self.profile.count("eventsScanned")
+                # advance our simulation time to the event
+                self.currentTime = minTimeEvent.timestamp
+                process = minTimeEvent.process
+                if type(minTimeEvent) == ProcessArrivalEvent:
+                    if profiling:
+                        self.profile.count("arrivals")
+                    # the next process from the stream is due
+                    if self.arrivals is not None:
+                        self.pushNextArrival()
+                    self.incomingProcesses.append(process)
+                    # with a CPU idle the process is dispatched in the next round, otherwise
+                    # it takes the CPU of the longest remaining job if that one is longer
+                    if len(self.idleCPUs) == 0:
+                        if profiling:
+                            phaseStart = perf_counter()
+                        eventToReplace = None
+                        RemCycles = self.expectedCycles(process)
+                        for cpuClass in self.topology.classes:
+                            ev = self.running.longest(cpuClass.name)
+                            if ev is None:
+                                continue
+                            if profiling:
+                                self.profile.count("eventsScanned")
+                            if self.remainingCycles(ev) > RemCycles:
+                                eventToReplace = ev
+                                RemCycles = self.remainingCycles(ev)
+                        if eventToReplace is not None:
+                            ev = eventToReplace
+                            # remove the event from the queue, the handle is only marked as cancelled
+                            self.events.cancel(self.running.remove(ev))
+                            # preempt the process, back to the queue with the cycles it has left
+                            processToReplace = ev.process
+                            processToReplace.RemCPUCycles -= (self.currentTime - processToReplace.startTime) // self.speed[ev.cpu]
+                            if self.trace.events:
+                                self.trace.complete(self.currentTime, processToReplace, self.topology.names[ev.cpu])
+                            self.incomingProcesses.append(processToReplace)
+                            self.idleCPUs.append(ev.cpu)
+                            if profiling:
+                                self.profile.count("preemptions")
+                        if profiling:
+                            self.profile.add("preemption", phaseStart)
+                else:
+                    # process done event
+                    cpu = minTimeEvent.cpu
+                    self.running.remove(minTimeEvent)
+                    # put the process to completed
+                    process.RemCPUCycles = 0
+                    # completed at this time of the simulation
+                    process.completedTime = self.currentTime
+                    self.completed.add(process)
+                    if self.lengthPredictor is not None:
+                        self.lengthPredictor.observe(process)
+                    if profiling:
+                        self.profile.count("completions")
+                    if self.trace.events:
+                        self.trace.complete(self.currentTime, process, self.topology.names[cpu])
+                    # put the CPU back to idle
+                    self.idleCPUs.append(cpu)
+        if profiling:
+            self.profile.add("run", runStart)
+        # the run is over, write out the trace
+        self.trace.end(self.currentTime, self.contextSwitches, len(self.completed))
+
+    def stats(self):
+        # the statistics of the run, the times are in seconds at 4GHz
+        stats = self.completed.stats()
+        stats["contextSwitches"] = self.contextSwitches
+        if self.profile.enabled:
+            stats.update(self.profile.stats())
+        return stats
+
+    def printStats(self):
+        stats = self.stats()
+        print("Statistics:")
+        # print the averages
+        print("Average wait time (seconds at 4GHz): {}".format(stats["waitTime"]))
+        print("Average turnaround time (seconds at 4GHz): {}".format(stats["turnaroundTime"]))
+        print("Context switches: {}".format(stats["contextSwitches"]))
+        printLatency(stats)
+        if self.profile.enabled:
+            self.profile.printStats()
+
+
+def queueProcesses(simo, processes):
+    # Process-like objects, e.g. the rows of a ProcessTable, in arrival time order
+    def arrivals():
+        for process in processes:
+            # the process is placed into the event queue for arrival
+            if process.MemorySize <= simo.memory:
+                yield process
+            else:
+                print("Rejecting Process {} with memory size {} exceeding {} GB".format(process.PID, process.MemorySize, simo.memory))
+    simo.addArrivals(arrivals())
+
+
+def addProcesses(simo, rows):
+    # add the workload rows to the simulation, rows must be in arrival time order
+    # the processes are created as the simulation gets to them
+    queueProcesses(simo, (Process(PID, CPUCycles, MemorySize, Arrival) for PID, CPUCycles, MemorySize, Arrival in rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workload", nargs="?", default='processes8_16_arrival.csv', help="workload file, CSV or binary")
+    parser.add_argument("--topology", default=None, help="CPU topology JSON file, by default the 6 CPUs of defaultTopology()")
+    parser.add_argument("--profile", action="store_true", help="print the run loop profile with the statistics")
+    args = parser.parse_args()
+    workloadPath = args.workload
+    # create a simulation instance
+    simo = Simulation(profile=Profiler(args.profile), topology=Topology.fromFile(args.topology) if args.topology else None)
+    # read the processes in arrival order, as the simulation gets to them
+    addProcesses(simo, streamArrivals(workloadPath))
+    simo.run()
+    simo.printStats()
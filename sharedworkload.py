@@ -0,0 +1,84 @@
+from array import array
+from multiprocessing import shared_memory
+
+from processtable import ProcessTable
+from workload import BinaryWorkload, isBinaryWorkload, readWorkload
+
+
+# A workload loaded once into shared memory for parallel simulation workers
+# the block holds the PID, CPUCycles, MemorySize and Arrival columns plus the ids of
+# the processes in arrival order, all int64, the parent process creates it and the
+# workers attach to it by name and read the columns in place, without a copy
+# every run builds a ProcessTable over the shared columns, so a worker only
+# allocates its own RemCPUCycles, start and completion columns
+
+
+columnNames = ("PID", "CPUCycles", "MemorySize", "Arrival", "order")
+
+
+class SharedWorkload:
+    def __init__(self, memory, count, owner):
+        self.memory = memory
+        self.count = count
+        self.owner = owner
+        view = memoryview(memory.buf)
+        for i, name in enumerate(columnNames):
+            setattr(self, name, view[i * count * 8:(i + 1) * count * 8].cast("q"))
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def create(cls, path):
+        # load a CSV or binary workload into a new shared memory block
+        if isBinaryWorkload(path):
+            workload = BinaryWorkload(path)
+            columns = [workload.PID, workload.CPUCycles, workload.MemorySize, workload.Arrival]
+        else:
+            workload = None
+            columns = [array("q") for i in range(4)]
+            for row in readWorkload(path):
+                for column, value in zip(columns, row):
+                    column.append(value)
+        count = len(columns[0])
+        memory = shared_memory.SharedMemory(create=True, size=max(1, len(columnNames) * count * 8))
+        shared = cls(memory, count, True)
+        for name, column in zip(columnNames, columns):
+            getattr(shared, name)[:] = column
+        # arrival order, processes with the same arrival stay in file order
+        shared.order[:] = array("q", sorted(range(count), key=shared.Arrival.__getitem__))
+        if workload is not None:
+            workload.close()
+        return shared
+
+    @classmethod
+    def attach(cls, name, count):
+        # attach to a block created by another process, read-only use
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before Python 3.13 attaching also registers the block with the resource
+            # tracker, the pool workers share the tracker of the parent, which
+            # already tracks the block, and the parent unlinks it
+            memory = shared_memory.SharedMemory(name=name)
+        return cls(memory, count, False)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def table(self, useArrival=True):
+        # a ProcessTable over the shared columns with its own per-run state
+        return ProcessTable.fromColumns(self.PID, self.CPUCycles, self.MemorySize, self.Arrival if useArrival else None)
+
+    def processes(self, table, arrivalOrder=False):
+        # the rows of the table, in file order or in arrival time order
+        ids = self.order if arrivalOrder else range(self.count)
+        return (table.row(id) for id in ids)
+
+    def close(self):
+        for name in columnNames:
+            getattr(self, name).release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
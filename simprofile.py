@@ -0,0 +1,57 @@
+import time
+
+
+# Profiling of the simulation run loops
+# phases, the wall time spent in each is added up over the run:
+#   run            - the whole run loop, the rest is what the phases below leave out
+#   eventSelection - taking the next event off the event queue
+#   readySelection - taking the next process off a ready queue
+#   preemption     - the search for a running job to preempt when a process arrives
+#   migration      - the search for a running job to move to a free faster CPU
+# counters:
+#   dispatches     - processes put on a CPU, including migrations
+#   completions    - processes completed
+#   preemptions    - processes taken off a CPU before completing, a quantum in RR
+#   migrations     - processes moved from a slower CPU to a free faster CPU
+#   reservations   - processes that waited for a reserved CPU instead of preempting
+#   skippedQuanta  - RR quanta run out without an event, see schedulingRR, they are in
+#                    the dispatches and preemptions as well
+#   batchJobs      - processes scheduled in one go, see batchschedule, they are in the
+#                    dispatches and completions as well
+#   arrivals       - arrival events
+#   eventsScanned  - events taken off the event queue and running jobs looked at
+#                    by the preemption and migration searches
+# the simulations read profiler.enabled once at the start of the run into a local,
+# so with profiling off the hot path only pays a test of that local per phase
+
+phases = ("run", "eventSelection", "readySelection", "preemption", "migration")
+counters = ("dispatches", "completions", "preemptions", "migrations", "reservations", "skippedQuanta", "batchJobs", "arrivals", "eventsScanned")
+
+
+class Profiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.times = dict.fromkeys(phases, 0.0)
+        self.counts = dict.fromkeys(counters, 0)
+
+    def add(self, phase, start):
+        # add the time since start, a time.perf_counter() value, to the phase
+        self.times[phase] += time.perf_counter() - start
+
+    def count(self, counter, n=1):
+        self.counts[counter] += n
+
+    def stats(self):
+        # the counters and the phase times in seconds, e.g. eventSelectionTime
+        stats = dict(self.counts)
+        for phase in phases:
+            stats[phase + "Time"] = self.times[phase]
+        return stats
+
+    def printStats(self):
+        print("Profile:")
+        for phase in phases:
+            share = self.times[phase] / self.times["run"] * 100 if self.times["run"] else 0
+            print("{} time: {:.6f} s ({:.1f}%)".format(phase, self.times[phase], share))
+        for counter in counters:
+            print("{}: {}".format(counter, self.counts[counter]))
@@ -0,0 +1,147 @@
+import math
+
+
+# Statistics of the completed processes, updated as every process completes
+# the simulations do not keep the completed processes, only a Distribution of
+# the wait and the turnaround time of each memory class, 8GB for processes of up
+# to smallMemory, the memory of the small CPUs of the topology, see
+# Topology.smallMemory, 16GB for the larger ones, the statistics of all the
+# processes are the classes merged when they are asked for
+# a Distribution keeps the count, the exact integer total and sum of squares, so the
+# mean is the same as summing all the values, and a log-bucketed histogram that
+# gives any quantile within 1% of the true value in a bounded number of buckets,
+# a few thousand at most for cycle counts
+# the times are in cycles, the reported statistics in seconds at 4GHz as before
+
+CLOCK = 4E9
+quantiles = (("P50", 0.5), ("P95", 0.95), ("P99", 0.99), ("P99.9", 0.999))
+memoryClasses = ("8GB", "16GB")
+
+# value v >= 1 is counted in bucket ceil(log(v) / log(gamma)), every value of a
+# bucket is within relativeAccuracy of the bucket's midpoint, values below 1 count as 0
+relativeAccuracy = 0.01
+gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+inverseLogGamma = 1 / math.log(gamma)
+
+
+class Distribution:
+    __slots__ = ("count", "total", "squares", "min", "max", "zeros", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self.min = None
+        self.max = None
+        self.zeros = 0
+        self.buckets = {}
+
+    def add(self, value):
+        if self.count == 0:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+        self.squares += value * value
+        if value < 1:
+            self.zeros += 1
+        else:
+            key = math.ceil(math.log(value) * inverseLogGamma)
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        # add the values of the other distribution to this one
+        if other.count == 0:
+            return
+        self.min = other.min if self.count == 0 else min(self.min, other.min)
+        self.max = other.max if self.count == 0 else max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        self.zeros += other.zeros
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+    def stddev(self):
+        # sample standard deviation, the variance is exact before the square root
+        if self.count < 2:
+            return 0.0
+        return math.sqrt((self.count * self.squares - self.total * self.total) / (self.count * (self.count - 1)))
+
+    def quantile(self, q):
+        # the value at quantile q, 0 <= q <= 1, None if nothing was added
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return max(0, self.min)
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                value = 2 * gamma ** key / (gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class CompletionStats:
+    def __init__(self, smallMemory=8):
+        # the most memory of a process of the 8GB class, set from the topology by run
+        self.smallMemory = smallMemory
+        # memory class -> (wait time, turnaround time)
+        self.classes = {memoryClass: (Distribution(), Distribution()) for memoryClass in memoryClasses}
+
+    def __len__(self):
+        return sum(wait.count for wait, turnaround in self.classes.values())
+
+    def add(self, process):
+        # a process has completed, the process itself is not kept
+        turnAroundTime = process.completedTime - process.arrivalTime
+        wait, turnaround = self.classes["8GB" if process.MemorySize <= self.smallMemory else "16GB"]
+        wait.add(turnAroundTime - process.CPUCycles)
+        turnaround.add(turnAroundTime)
+
+    def stats(self):
+        # the statistics of all the processes, then of each memory class, e.g. waitTimeP99_8GB
+        wait, turnaround = Distribution(), Distribution()
+        for classWait, classTurnaround in self.classes.values():
+            wait.merge(classWait)
+            turnaround.merge(classTurnaround)
+        stats = distributionStats(wait, turnaround)
+        for memoryClass in memoryClasses:
+            stats.update(distributionStats(*self.classes[memoryClass], suffix="_" + memoryClass))
+        return stats
+
+
+def distributionStats(wait, turnaround, suffix=""):
+    # processes, the averages, the standard deviations and the quantiles,
+    # in seconds at 4GHz, e.g. waitTime, waitTimeStddev, waitTimeP99
+    stats = {
+        "processes" + suffix: wait.count,
+        "waitTime" + suffix: wait.average() / CLOCK,
+        "turnaroundTime" + suffix: turnaround.average() / CLOCK,
+        "waitTimeStddev" + suffix: wait.stddev() / CLOCK,
+        "turnaroundTimeStddev" + suffix: turnaround.stddev() / CLOCK,
+    }
+    for name, distribution in (("waitTime", wait), ("turnaroundTime", turnaround)):
+        for label, q in quantiles:
+            value = distribution.quantile(q)
+            stats[name + label + suffix] = None if value is None else value / CLOCK
+    return stats
+
+
+def printLatency(stats):
+    # print the quantiles and the memory class breakdown of a Simulation's stats()
+    for name, title in (("waitTime", "Wait time"), ("turnaroundTime", "Turnaround time")):
+        print("{} percentiles (seconds at 4GHz): {}".format(title, ", ".join("{}={}".format(label.lower(), stats[name + label]) for label, q in quantiles)))
+    for memoryClass in memoryClasses:
+        suffix = "_" + memoryClass
+        print("{} processes: {}, average wait time {}, average turnaround time {}, p99 wait time {}, p99 turnaround time {}".format(
+            memoryClass, stats["processes" + suffix], stats["waitTime" + suffix], stats["turnaroundTime" + suffix],
+            stats["waitTimeP99" + suffix], stats["turnaroundTimeP99" + suffix]))
@@ -0,0 +1,132 @@
+import csv
+import struct
+import sys
+
+
+# Trace output for the simulations
+# levels:
+#   OFF     - nothing is written
+#   SUMMARY - one summary record when the run ends
+#   EVENTS  - a record for every dispatch and completion, plus the summary
+# formats:
+#   text   - the "Simo time ..." lines, the default, to stdout
+#            there is no summary record, printStats prints the summary
+#   csv    - time,event,PID,cpu,RemCPUCycles rows
+#   binary - fixed size little-endian records, see recordFormat, the CPU is an id,
+#            before the first record of a CPU a NAME record gives its id and the
+#            length of its name, followed by the name in UTF-8, readBinary reads it back
+# records are kept in a buffer and written out in blocks
+# the simulations check tracer.events before calling start/complete,
+# so with tracing off there is no formatting and no call at all on the hot path
+
+OFF = 0
+SUMMARY = 1
+EVENTS = 2
+
+# event kinds
+START = 0
+COMPLETE = 1
+END = 2
+NAME = 3
+
+# time, kind, PID, cpu id, remaining cycles
+# a NAME record is 0, NAME, cpu id, -1, name length
+recordFormat = struct.Struct("<qBqqq")
+
+
+class Tracer:
+    def __init__(self, level=EVENTS, path=None, format="text", bufferSize=4096):
+        self.level = level
+        # checked by the simulations before every start/complete record
+        self.events = level >= EVENTS
+        self.format = format
+        self.path = path
+        self.bufferSize = bufferSize
+        self.buffer = []
+        self.file = None
+        self.writer = None
+        # binary format, cpu name -> id, the ids are given in the order the names appear
+        self.cpuIds = {}
+
+    def open(self):
+        # open the output on the first write
+        if self.path is None:
+            self.file = sys.stdout
+        elif self.format == "binary":
+            self.file = open(self.path, "wb")
+        else:
+            self.file = open(self.path, "w", newline="")
+        if self.format == "csv":
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["time", "event", "PID", "cpu", "RemCPUCycles"])
+
+    def record(self, time, kind, process, cpu):
+        if self.format == "text":
+            if kind == START:
+                self.buffer.append("Simo time {}: Process {} starts on CPU {}\n".format(time, process, cpu))
+            else:
+                self.buffer.append("Simo time {}: Process {} completes on CPU {}\n".format(time, process, cpu))
+        elif self.format == "csv":
+            self.buffer.append((time, "start" if kind == START else "complete", process.PID, cpu, process.RemCPUCycles))
+        else:
+            self.buffer.append(recordFormat.pack(time, kind, process.PID, self.cpuId(cpu), process.RemCPUCycles))
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def cpuId(self, cpu):
+        # id of the cpu name, a new name gets a NAME record in the buffer
+        cpuId = self.cpuIds.get(cpu)
+        if cpuId is None:
+            cpuId = self.cpuIds[cpu] = len(self.cpuIds)
+            name = str(cpu).encode()
+            self.buffer.append(recordFormat.pack(0, NAME, cpuId, -1, len(name)) + name)
+        return cpuId
+
+    def start(self, time, process, cpu):
+        # a process is dispatched on the CPU
+        self.record(time, START, process, cpu)
+
+    def complete(self, time, process, cpu):
+        # a process leaves the CPU, completed or at the end of its quantum
+        self.record(time, COMPLETE, process, cpu)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.file is None:
+            self.open()
+        if self.format == "text":
+            self.file.write("".join(self.buffer))
+        elif self.format == "csv":
+            self.writer.writerows(self.buffer)
+        else:
+            self.file.write(b"".join(self.buffer))
+        self.buffer = []
+
+    def end(self, time, contextSwitches, nCompleted):
+        # the run is over, write the summary and flush the buffer
+        if self.level >= SUMMARY:
+            if self.format == "csv":
+                self.buffer.append((time, "end", nCompleted, "", contextSwitches))
+            elif self.format == "binary":
+                self.buffer.append(recordFormat.pack(time, END, nCompleted, -1, contextSwitches))
+        self.flush()
+        if self.file is not None and self.path is not None:
+            self.file.close()
+            self.file = None
+
+
+def readBinary(path):
+    # the records of a binary trace as (time, kind, PID, cpu name, remaining cycles),
+    # the NAME records are read into the names, an END record has no cpu name
+    names = {}
+    with open(path, "rb") as trace_file:
+        while True:
+            record = trace_file.read(recordFormat.size)
+            if not record:
+                return
+            time, kind, PID, cpu, remaining = recordFormat.unpack(record)
+            if kind == NAME:
+                names[PID] = trace_file.read(remaining).decode()
+            else:
+                yield time, kind, PID, names.get(cpu), remaining
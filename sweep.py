@@ -0,0 +1,192 @@
+import argparse
+import csv
+import importlib
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sharedworkload import SharedWorkload
+from simprofile import Profiler
+from simtrace import OFF, Tracer
+from topology import Topology
+
+
+# Parameter sweep over the scheduling simulations
+# a sweep is a grid of policies and parameter values, every point of the grid is
+# one simulation run, the runs are spread over all the cores with a process pool
+# and the statistics of every run are collected into one results table
+#
+# parameters are set as attributes of the Simulation instance before it runs,
+# a parameter only applies to the policies whose Simulation class declares it as a
+# class attribute, the tunables, and not to the state an instance makes in __init__,
+# e.g. TimeQuantum only to RR and MLFQ, migrationCost to the heterogeneous, memory,
+# arrival and MCT policies, backfilling=1 only to the arrival policy, useArrivals=1
+# to PS, which then gets the arrival times of the workload
+# the CPUs are set with the topology parameter, a topology file, and CLASS.count,
+# CLASS.speedFactor and CLASS.memory parameters change a CPU class of the topology,
+# e.g. CPUs.count for FIFO, SJF, RR, PS, SRTF and MLFQ, slow.speedFactor for the heterogeneous
+# and MCT policies, 8GB.speedFactor for the memory and arrival policies
+#
+# every workload is read once by the parent into shared memory, the workers attach
+# to it and simulate straight from the shared columns, so a large workload is held
+# in memory once and not parsed and copied again for every run
+#
+# with --profile the run loop profile counters and phase times are added to the results
+#
+# python sweep.py processes8_16_arrival.csv -p FIFO SJF RR -P TimeQuantum=1e9,1e10 -P CPUs.count=4,6 -o results.csv
+
+
+# policy -> (module, rows must be in arrival order, uses the arrival times)
+policies = {
+    "FIFO": ("schedulingFIFO", False, False),
+    "SJF": ("schedulingSJF", False, False),
+    "RR": ("schedulingRR", False, False),
+    "PS": ("schedulingPS", False, False),
+    "MCT": ("schedulingMCT", False, False),
+    "heterogeneous": ("schedulingSJFheterogeneous", False, False),
+    "memory": ("schedulingSJF_MemorySize", False, True),
+    "arrival": ("schedulingSJF_MemorySize_ArrivalTime", True, True),
+    "SRTF": ("schedulingSRTF", True, True),
+    "MLFQ": ("schedulingMLFQ", True, True),
+}
+
+# shared workloads attached by this worker, by name
+attached = {}
+
+
+def newSimulation(policy, params, profile=False):
+    # a simulation of the policy with the parameters set, tracing off
+    module = importlib.import_module(policies[policy][0])
+    topology = Topology.fromFile(params["topology"]) if "topology" in params else None
+    simo = module.Simulation(trace=Tracer(OFF), profile=Profiler(profile), topology=topology)
+    classChanges = {name: value for name, value in params.items() if "." in name}
+    if classChanges:
+        simo.setTopology(simo.topology.changed(classChanges))
+    for name, value in params.items():
+        if name != "topology" and "." not in name:
+            setattr(simo, name, value)
+    return simo
+
+
+def isTunable(simo, name):
+    # a class attribute of the Simulation that is not a method
+    for cls in type(simo).__mro__:
+        if name in vars(cls):
+            return not name.startswith("_") and not callable(vars(cls)[name])
+    return False
+
+
+def acceptedParams(policy, params):
+    # the parameters that apply to the policy, a CPU class parameter applies if
+    # the class is in the default topology of the policy or in one of the topology files
+    simo = newSimulation(policy, {})
+    topologies = [simo.topology] + [Topology.fromFile(path) for path in params.get("topology", [])]
+    accepted = {}
+    for name, value in params.items():
+        if name == "topology":
+            accepted[name] = value
+        elif "." in name:
+            if any(name.split(".", 1)[0] in topology for topology in topologies):
+                accepted[name] = value
+        elif isTunable(simo, name):
+            accepted[name] = value
+    return accepted
+
+
+def attachWorkload(name, count):
+    # the shared workload, attached once per worker
+    if name not in attached:
+        attached[name] = SharedWorkload.attach(name, count)
+    return attached[name]
+
+
+def runPoint(point):
+    # run one point of the grid, returns its row of the results table
+    policy, params, workloadPath, sharedName, count, profile = point
+    moduleName, arrivalOrder, useArrival = policies[policy]
+    module = importlib.import_module(moduleName)
+    simo = newSimulation(policy, params, profile)
+    workload = attachWorkload(sharedName, count)
+    table = workload.table(useArrival or getattr(simo, "useArrivals", False))
+    module.queueProcesses(simo, workload.processes(table, arrivalOrder))
+    start = time.perf_counter()
+    simo.run()
+    result = {"policy": policy, "workload": workloadPath}
+    result.update(params)
+    result.update(simo.stats())
+    result["wallTime"] = time.perf_counter() - start
+    return result
+
+
+def grid(policyNames, params, workloads, profile=False):
+    # every point of the grid, each policy only gets the parameters it accepts
+    # so a policy is not run again for values of a parameter it ignores
+    # workloads maps the workload paths to their shared workloads
+    points = []
+    for policy in policyNames:
+        accepted = acceptedParams(policy, params)
+        names = list(accepted)
+        for values in itertools.product(*[accepted[name] for name in names]):
+            for workloadPath, shared in workloads.items():
+                points.append((policy, dict(zip(names, values)), workloadPath, shared.name, len(shared), profile))
+    return points
+
+
+def sweep(policyNames, params, workloads, workers=None, profile=False):
+    # run the grid over a process pool, returns the results table in grid order
+    # the workloads are loaded into shared memory for the runs and released after
+    shared = {}
+    try:
+        for workloadPath in workloads:
+            shared[workloadPath] = SharedWorkload.create(workloadPath)
+        points = grid(policyNames, params, shared, profile)
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            return list(pool.map(runPoint, points))
+    finally:
+        for workload in shared.values():
+            workload.close()
+
+
+def writeResults(results, path):
+    columns = []
+    for result in results:
+        for name in result:
+            if name not in columns:
+                columns.append(name)
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, columns)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def parseValue(text):
+    # parameter values are ints where possible, e.g. 1e10 is 10 ** 10, paths stay text
+    try:
+        value = float(text)
+    except ValueError:
+        return text
+    return int(value) if value == int(value) else value
+
+
+def parseParam(text):
+    # NAME=v1,v2,...
+    name, values = text.split("=", 1)
+    return name, [parseValue(value) for value in values.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a grid of scheduling simulations over all cores")
+    parser.add_argument("workloads", nargs="+", help="workload files, CSV or binary")
+    parser.add_argument("-p", "--policy", nargs="+", choices=list(policies), default=list(policies))
+    parser.add_argument("-P", "--param", action="append", default=[], help="NAME=v1,v2,... e.g. TimeQuantum=1e9,1e10")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("-o", "--output", default="sweep_results.csv")
+    parser.add_argument("--profile", action="store_true", help="add the run loop profile to the results")
+    args = parser.parse_args()
+
+    params = dict(parseParam(param) for param in args.param)
+    start = time.perf_counter()
+    results = sweep(args.policy, params, args.workloads, args.workers, args.profile)
+    writeResults(results, args.output)
+    print("{} runs in {:.1f} seconds, results in {}".format(len(results), time.perf_counter() - start, args.output))
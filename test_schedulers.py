@@ -0,0 +1,261 @@
+import os
+import random
+import tempfile
+
+import schedulingFIFO
+import schedulingMCT
+import schedulingMLFQ
+import schedulingRR
+import schedulingSJF
+import schedulingSJFheterogeneous
+import schedulingSJF_MemorySize_ArrivalTime
+from migration import Migrator
+from predictors import makePredictor
+from simprofile import Profiler
+from simstats import Distribution, relativeAccuracy
+from simtrace import Tracer, OFF, EVENTS, START, COMPLETE, END, readBinary
+from topology import CPUClass, Topology
+
+
+# Small self-checks of the schedulers, run with python -m pytest or python test_schedulers.py
+# each check builds a simulation with the trace off on a topology of a few CPUs
+# the shortcuts, RR quantum skipping and the FIFO and SJF batch schedule, are checked
+# against the event loop on random workloads from fixed seeds
+
+
+def runRR(sizes, cpus, speedFactor, quantum, skipping):
+    simo = schedulingRR.Simulation(trace=Tracer(OFF), topology=Topology([CPUClass("CPUs", cpus, speedFactor=speedFactor)]))
+    simo.quantumSkipping = skipping
+    simo.TimeQuantum = quantum
+    processes = [schedulingRR.Process(PID, CPUCycles, 4) for PID, CPUCycles in enumerate(sizes)]
+    schedulingRR.queueProcesses(simo, processes)
+    simo.run()
+    return [process.completedTime for process in processes], simo.contextSwitches
+
+
+def testRRQuantumSkipping():
+    # skipping the quanta gives the same completions and context switches as running
+    # every quantum
+    for seed in range(500):
+        rng = random.Random(seed)
+        quantum = rng.randint(1, 5)
+        sizes = [rng.randint(1, 60) for i in range(rng.randint(2, 14))]
+        cpus = rng.randint(1, 4)
+        speedFactor = rng.randint(1, quantum)
+        assert runRR(sizes, cpus, speedFactor, quantum, True) == runRR(sizes, cpus, speedFactor, quantum, False), seed
+
+
+def testBinaryTraceNames():
+    # CPU names longer than a record field are written once and read back whole
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.bin")
+        topology = Topology([CPUClass("CPUs", 2, names=["socket0-core0", "socket1-core12"])])
+        simo = schedulingFIFO.Simulation(trace=Tracer(EVENTS, path, "binary"), topology=topology)
+        simo.batchMode = False
+        schedulingFIFO.queueProcesses(simo, [schedulingFIFO.Process(PID, CPUCycles, 4) for PID, CPUCycles in ((0, 10), (1, 20))])
+        simo.run()
+        assert list(readBinary(path)) == [(0, START, 0, "socket0-core0", 10), (0, START, 1, "socket1-core12", 20),
+                                          (10, COMPLETE, 0, "socket0-core0", 0), (20, COMPLETE, 1, "socket1-core12", 0),
+                                          (20, END, 2, None, 2)]
+
+
+def runBatch(module, sizes, topology, batchMode):
+    simo = module.Simulation(trace=Tracer(OFF), topology=topology)
+    simo.batchMode = batchMode
+    module.queueProcesses(simo, [module.Process(PID, CPUCycles, MemorySize) for PID, CPUCycles, MemorySize in sizes])
+    simo.run()
+    return simo.stats(), simo.currentTime
+
+
+def testBatchSchedule():
+    # the batch schedule gives the same statistics and end time as the event loop
+    for seed in range(100):
+        rng = random.Random(seed)
+        sizes = [(PID, rng.randint(1, 10 ** 6), rng.randint(1, 16)) for PID in range(rng.randint(1, 200))]
+        topology = Topology([CPUClass("slow", rng.randint(0, 3), speedFactor=rng.randint(2, 4)), CPUClass("fast", rng.randint(1, 4))])
+        for module in (schedulingFIFO, schedulingSJF):
+            assert runBatch(module, sizes, topology, True) == runBatch(module, sizes, topology, False), (module.__name__, seed)
+
+
+def runPredicted(predictor):
+    # one CPU, the 16GB jobs are 1 and 3
+    simo = schedulingSJF.Simulation(trace=Tracer(OFF), topology=Topology([CPUClass("CPUs", 1)]))
+    simo.predictor = predictor
+    processes = [schedulingSJF.Process(PID, CPUCycles, MemorySize) for PID, CPUCycles, MemorySize in ((0, 100, 4), (1, 10, 12), (2, 50, 4), (3, 200, 12))]
+    schedulingSJF.queueProcesses(simo, processes)
+    simo.run()
+    return [(process.startTime, process.completedTime) for process in processes]
+
+
+def testPredictedShortFirst():
+    # the oracle runs the jobs on their true lengths, the exponential average predicts
+    # 0 for all until 0 completes, then 100 for both classes, 1 completes in 10, so the
+    # 16GB job 3 is predicted 10 and runs before the 8GB job 2 predicted 100
+    assert runPredicted("oracle") == [(60, 160), (0, 10), (10, 60), (160, 360)]
+    assert runPredicted("exponential") == [(0, 100), (100, 110), (310, 360), (110, 310)]
+
+
+def runArrivals(jobs, upFront):
+    simo = schedulingSJF_MemorySize_ArrivalTime.Simulation(trace=Tracer(OFF))
+    processes = [schedulingSJF_MemorySize_ArrivalTime.Process(*job) for job in jobs]
+    if upFront:
+        for process in processes:
+            simo.events.push(schedulingSJF_MemorySize_ArrivalTime.ProcessArrivalEvent(process, process.arrivalTime))
+    else:
+        schedulingSJF_MemorySize_ArrivalTime.queueProcesses(simo, processes)
+    simo.run()
+    return [process.completedTime for process in processes]
+
+
+def testArrivalTieOrder():
+    # the arrivals streamed one at a time come before the completions at the same time,
+    # the same schedule as with all the arrivals in the event queue up front
+    for seed in range(100):
+        rng = random.Random(seed)
+        jobs = []
+        arrival = 0
+        for PID in range(rng.randint(5, 40)):
+            arrival += rng.choice((0, 5, 10))
+            jobs.append((PID, rng.choice((5, 10, 15, 20)), rng.choice((4, 12)), arrival))
+        assert runArrivals(jobs, False) == runArrivals(jobs, True), seed
+
+
+def testMCTCommit():
+    # committed longest first, 40 on the fast CPU, 30 on the slow one where it completes
+    # at 60, 20 and 10 on the fast one, which runs its jobs shortest first
+    simo = schedulingMCT.Simulation(trace=Tracer(OFF), topology=Topology([CPUClass("slow", 1, speedFactor=2), CPUClass("fast", 1)]))
+    processes = [schedulingMCT.Process(PID, CPUCycles, 4) for PID, CPUCycles in enumerate((10, 20, 30, 40))]
+    schedulingMCT.queueProcesses(simo, processes)
+    simo.run()
+    assert [(process.startTime, process.completedTime) for process in processes] == [(0, 10), (10, 30), (0, 60), (30, 70)]
+    assert simo.currentTime == 70
+
+
+def testMCTStealQueued():
+    # CPU0 has three jobs committed and nothing running, the idle CPU1 takes the last one
+    simo = schedulingMCT.Simulation(trace=Tracer(OFF), topology=Topology([CPUClass("CPUs", 2)]))
+    simo.migrator = Migrator(simo.speed)
+    processes = [schedulingMCT.Process(PID, CPUCycles, 4) for PID, CPUCycles in enumerate((10, 20, 30))]
+    schedulingMCT.queueProcesses(simo, processes)
+    for process in processes:
+        simo.queued[0].append(simo.incomingProcesses.pop())
+    simo.projected[0] = 60
+    simo.pushBacklog(0)
+    # a committed job leaves no running CPU behind
+    assert simo.steal(1, False) is None
+    assert [process.PID for process in simo.queued[0]] == [0, 1]
+    assert simo.projected == [30, 30]
+    event = simo.events.peek()
+    assert (event.cpu, event.process, event.timestamp) == (1, processes[2], 30)
+
+
+
+def testHeterogeneousStealSameTier():
+    # the slow CPU takes over the job of the slowest one, both are in the slow tier,
+    # every CPU is idle once at the end
+    simo = schedulingSJFheterogeneous.Simulation(trace=Tracer(OFF), topology=Topology([
+        CPUClass("slowest", 1, speedFactor=4), CPUClass("slow", 1, speedFactor=2), CPUClass("fast", 1)]))
+    processes = [schedulingSJFheterogeneous.Process(PID, CPUCycles, 4) for PID, CPUCycles in enumerate((10, 11, 100))]
+    schedulingSJFheterogeneous.queueProcesses(simo, processes)
+    simo.run()
+    assert [process.completedTime for process in processes] == [32, 22, 100]
+    assert sorted(simo.idleSlowCPUs) == [0, 1]
+    assert list(simo.idleFastCPUs) == [2]
+
+
+
+def runMLFQ(boostInterval):
+    # one CPU, quanta of 1, 2 and 4
+    simo = schedulingMLFQ.Simulation(trace=Tracer(OFF), topology=Topology([CPUClass("CPUs", 1)]))
+    simo.TimeQuantum = 1
+    simo.QuantumMultiplier = 2
+    simo.BoostInterval = boostInterval
+    processes = [schedulingMLFQ.Process(PID, CPUCycles, 4, 0) for PID, CPUCycles in ((1, 10), (2, 3))]
+    schedulingMLFQ.queueProcesses(simo, processes)
+    simo.run()
+    return [process.completedTime for process in processes], simo.contextSwitches, simo.boosts
+
+
+def testMLFQFeedback():
+    # both jobs run a quantum of 1 and go down, the short one completes in the quantum
+    # of 2 at 6, the long one runs 2, then 4 and 3 at the bottom level
+    assert runMLFQ(0) == ([13, 6], 6, 0)
+
+
+def testMLFQBoost():
+    # the boost at 5 moves the long job waiting at the bottom back to the top, it runs
+    # 1, 2 and 4 again, the boost at 10 is while it runs its last quantum
+    assert runMLFQ(5) == ([13, 6], 7, 2)
+
+
+def testQuantileAccuracy():
+    # every quantile is within 1% of the value at its rank, over values from 1 to 10**15
+    for seed in range(20):
+        rng = random.Random(seed)
+        values = [int(10 ** rng.uniform(0, 15)) for i in range(rng.randint(1, 2000))]
+        distribution = Distribution()
+        for value in values:
+            distribution.add(value)
+        values.sort()
+        for q in (0, 0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 0.999, 1):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(distribution.quantile(q) - exact) <= relativeAccuracy * exact, (seed, q)
+
+
+def testMemoryClassesFromTopology():
+    # the small CPUs have 4GB, so a 6GB job is in the 16GB class of the statistics
+    # and of the exponential predictor
+    topology = Topology([CPUClass("4GB", 1, memory=4), CPUClass("16GB", 1, memory=16)])
+    for batchMode in (True, False):
+        simo = schedulingFIFO.Simulation(trace=Tracer(OFF), topology=topology)
+        simo.batchMode = batchMode
+        schedulingFIFO.queueProcesses(simo, [schedulingFIFO.Process(PID, 10, MemorySize) for PID, MemorySize in ((0, 4), (1, 6), (2, 12))])
+        simo.run()
+        stats = simo.stats()
+        assert (stats["processes_8GB"], stats["processes_16GB"]) == (1, 2)
+    predictor = makePredictor("exponential", smallMemory=topology.smallMemory())
+    assert [predictor.key(schedulingFIFO.Process(0, 10, MemorySize)) for MemorySize in (4, 6, 12)] == ["8GB", "16GB", "16GB"]
+
+
+def runBackfilling(jobs, topology, backfilling):
+    simo = schedulingSJF_MemorySize_ArrivalTime.Simulation(trace=Tracer(OFF), profile=Profiler(), topology=topology)
+    simo.backfilling = backfilling
+    processes = [schedulingSJF_MemorySize_ArrivalTime.Process(*job) for job in jobs]
+    schedulingSJF_MemorySize_ArrivalTime.queueProcesses(simo, processes)
+    simo.run()
+    return [process.completedTime for process in processes], simo.stats()["reservations"]
+
+
+def testBackfillingReservation():
+    # the 8GB job on a 16GB CPU completes at 30, before the 16GB job running there at
+    # 100, so the 16GB job arriving at 5 waits for it instead of preempting it
+    topology = Topology([CPUClass("8GB", 1, speedFactor=2, memory=8), CPUClass("16GB", 2, memory=16)])
+    jobs = [(1, 100, 12, 0), (2, 30, 4, 0), (3, 200, 12, 5)]
+    assert runBackfilling(jobs, topology, False) == ([100, 55, 205], 0)
+    assert runBackfilling(jobs, topology, True) == ([100, 30, 230], 1)
+
+
+def testNoLargeMemoryCPUs():
+    # the 16GB jobs could never run, the memory policies reject the topology
+    topology = Topology([CPUClass("8GB", 2, memory=8), CPUClass("16GB", 0, memory=16)])
+    try:
+        schedulingSJF_MemorySize_ArrivalTime.Simulation(trace=Tracer(OFF), topology=topology)
+    except ValueError as error:
+        assert "16GB" in str(error)
+    else:
+        assert False, "a topology with no 16GB CPUs was accepted"
+
+
+def testBackfillingNoShadow():
+    # no 16GB job runs, so a waiting 16GB job has no shadow time and preempts the
+    # 8GB job holding the 16GB CPU
+    topology = Topology([CPUClass("8GB", 1, speedFactor=2, memory=8), CPUClass("16GB", 1, memory=16)])
+    jobs = [(1, 10 ** 12, 4, 0), (2, 10, 12, 5)]
+    assert runBackfilling(jobs, topology, True) == runBackfilling(jobs, topology, False) == ([10 ** 12 + 5, 15], 0)
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test") and callable(check):
+            check()
+            print("{} ok".format(name))
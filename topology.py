@@ -0,0 +1,104 @@
+import json
+
+
+# CPU topology of a simulation
+# the CPUs are put into classes, every class has a number of CPUs, a speed factor,
+# the time multiple of a job on it, 1 for the fastest CPUs, and a memory capacity in GB
+# a CPU is an integer id, the CPUs of the first class come first, and the per CPU
+# lists below give the class, speed and name of a CPU in O(1), so a simulation of
+# thousands of CPUs does not scan lists to find out what a CPU is
+# the names are only for the trace output
+#
+# a topology file is JSON:
+#   {"classes": [
+#       {"name": "8GB", "count": 3, "speedFactor": 2, "memory": 8, "names": ["Pa", "Pb", "Pc"]},
+#       {"name": "16GB", "count": 1000, "speedFactor": 1, "memory": 16}
+#   ]}
+# names are optional, by default the CPUs of a class are named class0, class1, ...
+
+
+class CPUClass:
+    def __init__(self, name, count, speedFactor=1, memory=16, names=None):
+        if names is not None and len(names) != count:
+            raise ValueError("CPU class {} has {} CPUs but {} names".format(name, count, len(names)))
+        self.name = name
+        self.count = count
+        self.speedFactor = speedFactor
+        self.memory = memory
+        self.names = names if names is not None else ["{}{}".format(name, i) for i in range(count)]
+        # ids of the CPUs of the class, set by the topology
+        self.cpus = []
+
+    def changed(self, **changes):
+        # a copy of the class with some attributes changed, the names are kept if the count is
+        values = {"name": self.name, "count": self.count, "speedFactor": self.speedFactor, "memory": self.memory}
+        values.update(changes)
+        names = self.names if values["count"] == self.count else None
+        return CPUClass(values["name"], values["count"], values["speedFactor"], values["memory"], names)
+
+
+class Topology:
+    def __init__(self, classes):
+        self.classes = classes
+        # CPU id -> class, speed factor, name
+        self.cpuClass = []
+        self.speed = []
+        self.names = []
+        for cpuClass in classes:
+            cpuClass.cpus = list(range(len(self.names), len(self.names) + cpuClass.count))
+            self.cpuClass += [cpuClass] * cpuClass.count
+            self.speed += [cpuClass.speedFactor] * cpuClass.count
+            self.names += cpuClass.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return any(cpuClass.name == name for cpuClass in self.classes)
+
+    def byName(self, name):
+        for cpuClass in self.classes:
+            if cpuClass.name == name:
+                return cpuClass
+        raise KeyError("no CPU class {}".format(name))
+
+    def cpus(self, classes):
+        # the ids of the CPUs of the classes
+        return [cpu for cpuClass in classes for cpu in cpuClass.cpus]
+
+    def changed(self, changes):
+        # a copy of the topology with class attributes changed, e.g. {"fast.count": 8}
+        classChanges = {}
+        for key, value in changes.items():
+            name, attribute = key.split(".", 1)
+            if attribute not in ("count", "speedFactor", "memory"):
+                raise KeyError("unknown CPU class attribute {}".format(attribute))
+            self.byName(name)
+            classChanges.setdefault(name, {})[attribute] = value
+        return Topology([cpuClass.changed(**classChanges.get(cpuClass.name, {})) for cpuClass in self.classes])
+
+    @classmethod
+    def fromFile(cls, path):
+        with open(path) as topology_file:
+            config = json.load(topology_file)
+        return cls([CPUClass(c["name"], c["count"], c.get("speedFactor", 1), c.get("memory", 16), c.get("names")) for c in config["classes"]])
+
+    def speedTiers(self):
+        # (slow, fast) classes, the fast ones have the smallest speed factor
+        fastest = min(cpuClass.speedFactor for cpuClass in self.classes)
+        return [c for c in self.classes if c.speedFactor != fastest], [c for c in self.classes if c.speedFactor == fastest]
+
+    def smallMemory(self):
+        # the most memory of a job of the small memory class, the least memory of the
+        # classes below the largest, 8 when all the classes have the same memory
+        largest = max(cpuClass.memory for cpuClass in self.classes)
+        return min((c.memory for c in self.classes if c.memory != largest), default=8)
+
+    def memoryTiers(self):
+        # (small, large) classes, the large ones have the most memory, they need CPUs, the
+        # jobs too large for the small classes only run there
+        largest = max(cpuClass.memory for cpuClass in self.classes)
+        large = [c for c in self.classes if c.memory == largest]
+        if sum(c.count for c in large) == 0:
+            raise ValueError("the CPU classes with the most memory, {} GB, have no CPUs: {}".format(largest, ", ".join(c.name for c in large)))
+        return [c for c in self.classes if c.memory != largest], large
@@ -0,0 +1,193 @@
+import csv
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+import numpy as np
+
+
+# Reading workloads for the simulations
+# a workload is the CSV written by the generator:
+#   Process ID, CPU Cycles, Memory Requirement, Arrival Time
+# or the same columns in the binary format below, the binary file is memory-mapped
+# so there is nothing to parse when it is opened
+# rows are yielded as (PID, CPUCycles, MemorySize, Arrival) tuples of ints
+
+# binary format, all little-endian:
+#   header: magic, version, number of processes
+#   columns: PID, CPUCycles, MemorySize, Arrival, each an int64 array of the processes
+binaryMagic = b"PSWL"
+binaryVersion = 1
+binaryHeader = struct.Struct("<4sIQ")
+binaryColumns = ("PID", "CPUCycles", "MemorySize", "Arrival")
+
+
+class BinaryWorkload:
+    # a memory-mapped binary workload, the columns are int64 memoryviews into the file
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise ValueError("binary workloads can only be mapped on little-endian machines")
+        with open(path, "rb") as binary_file:
+            self.map = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = binaryHeader.unpack_from(self.map)
+        if magic != binaryMagic or version != binaryVersion:
+            raise ValueError("{} is not a version {} binary workload".format(path, binaryVersion))
+        view = memoryview(self.map)
+        offset = binaryHeader.size
+        for name in binaryColumns:
+            setattr(self, name, view[offset:offset + self.count * 8].cast("q"))
+            offset += self.count * 8
+
+    def __len__(self):
+        return self.count
+
+    def rows(self):
+        return zip(self.PID, self.CPUCycles, self.MemorySize, self.Arrival)
+
+    def close(self):
+        for name in binaryColumns:
+            getattr(self, name).release()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def isBinaryWorkload(path):
+    with open(path, "rb") as workload_file:
+        return workload_file.read(len(binaryMagic)) == binaryMagic
+
+
+def readWorkload(path):
+    # yield the rows in the file order
+    if isBinaryWorkload(path):
+        # the file is unmapped when the rows are done or the generator is closed
+        with BinaryWorkload(path) as workload:
+            yield from workload.rows()
+        return
+    with open(path) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=',')
+        csvit = iter(csv_reader)
+        csvHeader = next(csvit)
+        for PID, CPUCycles, MemorySize, Arrival in csvit:
+            yield int(PID), int(CPUCycles), int(MemorySize), int(Arrival)
+
+
+def arrivalTime(row):
+    return row[3]
+
+
+def writeChunk(rows):
+    # write a sorted chunk to a temporary file, returns its path
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Process ID", "CPU Cycles", "Memory Requirement", "Arrival Time"])
+        writer.writerows(rows)
+    return path
+
+
+def streamArrivals(path, presorted=False, chunkSize=1000000):
+    # yield the rows in arrival time order, rows with the same arrival stay in file order
+    # a presorted file is streamed as it is read, a binary file is read through the
+    # arrival order of its mapped Arrival column, otherwise it is sorted in chunks of
+    # chunkSize rows and the chunks are merged, so memory holds one chunk at most
+    if presorted:
+        lastArrival = None
+        for row in readWorkload(path):
+            if lastArrival is not None and row[3] < lastArrival:
+                raise ValueError("Process {} arrives at {}, before the previous arrival {}".format(row[0], row[3], lastArrival))
+            lastArrival = row[3]
+            yield row
+        return
+
+    if isBinaryWorkload(path):
+        with BinaryWorkload(path) as workload:
+            # a stable sort keeps the file order of equal arrivals, the order is the only
+            # copy, 8 bytes a process, the rows are read from the map as they are yielded
+            arrival = np.frombuffer(workload.Arrival, dtype=np.int64)
+            order = np.argsort(arrival, kind="stable")
+            # the map can only be closed once numpy lets go of the column
+            del arrival
+            for start in range(0, len(order), chunkSize):
+                for i in order[start:start + chunkSize].tolist():
+                    yield workload.PID[i], workload.CPUCycles[i], workload.MemorySize[i], workload.Arrival[i]
+        return
+
+    chunk = []
+    chunkPaths = []
+    try:
+        for row in readWorkload(path):
+            chunk.append(row)
+            if len(chunk) >= chunkSize:
+                chunk.sort(key=arrivalTime)
+                chunkPaths.append(writeChunk(chunk))
+                chunk = []
+        chunk.sort(key=arrivalTime)
+        if not chunkPaths:
+            # the whole workload fits in one chunk
+            yield from chunk
+            return
+        chunkPaths.append(writeChunk(chunk))
+        chunk = []
+        yield from heapq.merge(*[readWorkload(chunkPath) for chunkPath in chunkPaths], key=arrivalTime)
+    finally:
+        for chunkPath in chunkPaths:
+            os.remove(chunkPath)
+
+
+
+class BinaryWorkloadWriter:
+    # writes a binary workload of a known number of processes in chunks
+    # each chunk is a slice of every column, given as int64 buffers, e.g. array("q")
+    def __init__(self, path, count):
+        self.count = count
+        self.written = 0
+        self.file = open(path, "wb")
+        self.file.write(binaryHeader.pack(binaryMagic, binaryVersion, count))
+        self.file.truncate(binaryHeader.size + len(binaryColumns) * count * 8)
+
+    def write(self, PID, CPUCycles, MemorySize, Arrival):
+        # write the chunk of every column at its place in the file
+        n = len(PID)
+        if self.written + n > self.count:
+            raise ValueError("more than {} processes written".format(self.count))
+        for i, column in enumerate((PID, CPUCycles, MemorySize, Arrival)):
+            self.file.seek(binaryHeader.size + (i * self.count + self.written) * 8)
+            self.file.write(column)
+        self.written += n
+
+    def close(self):
+        self.file.close()
+        if self.written != self.count:
+            raise ValueError("{} of {} processes written".format(self.written, self.count))
+
+
+def convertToBinary(csvPath, binaryPath, chunkSize=1000000):
+    # convert a CSV workload to the binary format, in chunks of chunkSize rows
+    with open(csvPath) as csv_file:
+        count = sum(1 for line in csv_file if line.strip()) - 1
+    writer = BinaryWorkloadWriter(binaryPath, count)
+    columns = [array("q") for name in binaryColumns]
+    for row in readWorkload(csvPath):
+        for column, value in zip(columns, row):
+            column.append(value)
+        if len(columns[0]) >= chunkSize:
+            writer.write(*columns)
+            columns = [array("q") for name in binaryColumns]
+    writer.write(*columns)
+    writer.close()
+    return count
+
+
+if __name__ == "__main__":
+    # python workload.py processes8_16_arrival.csv processes8_16_arrival.bin
+    count = convertToBinary(sys.argv[1], sys.argv[2])
+    print("Converted {} processes from {} to {}".format(count, sys.argv[1], sys.argv[2]))